@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Freshness per FMP endpoint (first path segment), in seconds. Quotes move
+# constantly while annual statements change a few times a year.
+DEFAULT_TTLS = {
+    "quote-short": 15,
+    "quote": 15,
+    "market-capitalization": 60,
+    "stock-screener": 15 * 60,
+    "profile": 24 * 3600,
+    "ratios": 7 * 86400,
+    "key-metrics": 7 * 86400,
+    "income-statement": 7 * 86400,
+    "balance-sheet-statement": 7 * 86400,
+    "cash-flow-statement": 7 * 86400,
+}
+DEFAULT_TTL = 3600
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fin-agent", "fmp.sqlite3")
+
+
+def cache_key(endpoint: str, params: Optional[Dict[str, Any]] = None, base_url: str = "") -> str:
+    """Build a stable cache key from the base URL, endpoint and params, ignoring the API key.
+
+    Responses of different servers, e.g. the real API and a local mock, never share entries.
+    """
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k != "apikey")
+    prefix = f"{base_url.rstrip('/')}/" if base_url else ""
+    return prefix + endpoint + "?" + "&".join(f"{k}={v}" for k, v in items)
+
+
+class TTLCache:
+    """Two-tier cache for FMP responses: an in-memory LRU in front of SQLite.
+
+    Entries expire according to a per-endpoint TTL and both tiers evict the
+    least recently used entries once they exceed their size bound. Cached
+    values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = 512,
+        max_disk_entries: int = 10000,
+        ttls: Optional[Dict[str, int]] = None,
+        default_ttl: int = DEFAULT_TTL,
+    ):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, expires REAL, accessed REAL, value TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._db.commit()
+
+    def ttl_for(self, endpoint: str) -> int:
+        return self.ttls.get(endpoint.split("/", 1)[0], self.default_ttl)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires, value FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    expires, raw = row
+                    if expires > now:
+                        self._db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        value = json.loads(raw)
+                        self._remember(key, expires, value)
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        now = time.time()
+        expires = now + ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, expires, accessed, value) VALUES (?, ?, ?, ?)",
+                    (key, expires, now, json.dumps(value)),
+                )
+                (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+                if count > self.max_disk_entries:
+                    excess = count - self.max_disk_entries
+                    self._db.execute(
+                        "DELETE FROM entries WHERE key IN "
+                        "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                        (excess,),
+                    )
+                    self.stats["evictions"] += excess
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    def _remember(self, key: str, expires: float, value: Any) -> None:
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+
+DEFAULT_PAGE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fin-agent", "pages.sqlite3")
+
+
+class PageCache:
+    """Persistent cache of extracted web page text keyed for conditional requests.
+
+    Each entry keeps the ETag and Last-Modified validators the page was served
+    with, so a revisit can ask the server whether it changed and reuse the
+    stored text on a 304. Once the stored text exceeds `max_bytes` the least
+    recently used pages are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_PAGE_CACHE_PATH, max_bytes: int = 100 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "refreshed": 0, "stored": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, accessed REAL, size INTEGER, text TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+        self._db.commit()
+        (self.size,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+
+    def lookup(self, key: str) -> Optional[Tuple[Optional[str], Optional[str], str]]:
+        """Return (etag, last_modified, text) for a stored page, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, text FROM pages WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+            return row
+
+    def revalidated(self, key: str) -> None:
+        """Record that the server confirmed the stored page is unchanged (304)."""
+        with self._lock:
+            self._db.execute("UPDATE pages SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.stats["hits"] += 1
+
+    def store(self, key: str, text: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            if previous is not None:
+                self.size -= previous[0]
+                self.stats["refreshed"] += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (key, etag, last_modified, accessed, size, text) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, etag, last_modified, time.time(), size, text),
+            )
+            self.size += size
+            self.stats["stored"] += 1
+            while self.size > self.max_bytes:
+                oldest = self._db.execute(
+                    "SELECT key, size FROM pages WHERE key != ? ORDER BY accessed LIMIT 16", (key,)
+                ).fetchall()
+                if not oldest:
+                    break
+                for evicted, evicted_size in oldest:
+                    self._db.execute("DELETE FROM pages WHERE key = ?", (evicted,))
+                    self.size -= evicted_size
+                    self.stats["evictions"] += 1
+                    if self.size <= self.max_bytes:
+                        break
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._db.commit()
+            self.size = 0
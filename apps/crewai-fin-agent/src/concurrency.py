@@ -0,0 +1,95 @@
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+DEFAULT_TOOL_WORKERS = 8
+# Tools that fan out on their own or parse large documents get a lower cap.
+DEFAULT_TOOL_LIMITS = {"Web Scraping Multiple Pages": 2, "Read Document": 2}
+
+
+def parse_limits(value: Optional[str]) -> Dict[str, int]:
+    """Parse per-tool caps given as "tool=2,other tool=1"."""
+    limits = {}
+    for item in (value or "").split(","):
+        name, _, limit = item.rpartition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+class ToolPool:
+    """Bounded thread pool running independent tool calls concurrently.
+
+    At most `max_workers` calls run at once, and at most `limits[name]` calls
+    of a given tool; calls over a tool's cap wait for a free slot while the
+    other tools keep running. `map` returns the results in call order.
+    `stats` counts the calls, the batches and the calls that waited for a cap.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_TOOL_WORKERS, limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers
+        self.limits = dict(limits or {})
+        self.stats: Dict[str, int] = Counter()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool-call")
+        self._semaphores = {name: threading.BoundedSemaphore(limit) for name, limit in self.limits.items()}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _call(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+        self._count("calls")
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            return fn(*args, **kwargs)
+        if not semaphore.acquire(blocking=False):
+            self._count("capped")
+            semaphore.acquire()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            semaphore.release()
+
+    def submit(self, name: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Schedule one call of tool `name`."""
+        return self._executor.submit(self._call, name, fn, args, kwargs)
+
+    def map(self, calls: Sequence[Tuple[str, Callable[[], Any]]]) -> List[Any]:
+        """Run (tool name, function) calls concurrently; returns their results in order.
+
+        A single call runs on the calling thread. The first error is raised
+        once every call has finished.
+        """
+        self._count("batches")
+        if len(calls) == 1:
+            name, fn = calls[0]
+            return [self._call(name, fn, (), {})]
+        futures = [self.submit(name, fn) for name, fn in calls]
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [future.result() for future in futures]
+
+
+_pool: Optional[ToolPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_tool_pool() -> ToolPool:
+    """Return the process-wide tool pool, sized by FIN_TOOL_WORKERS and FIN_TOOL_LIMITS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                load_dotenv()
+                _pool = ToolPool(
+                    max_workers=int(os.getenv("FIN_TOOL_WORKERS", str(DEFAULT_TOOL_WORKERS))),
+                    limits={**DEFAULT_TOOL_LIMITS, **parse_limits(os.getenv("FIN_TOOL_LIMITS"))},
+                )
+    return _pool
@@ -10,9 +10,19 @@ from tools import (
     KeyMetricsTool,
     StockScreenerTool,
     SingleLineItemQueryTool,
-    WebpageReadingTool
+    StockPricesTool,
+    CompanyProfilesTool,
+    MarketCapsTool,
+    WebpageReadingTool,
+    WebpagesReadingTool,
+    DocumentReadingTool,
+    ParallelToolCallsTool
 )
 
+def with_parallel_calls(tools):
+    """Add a tool that runs several calls of `tools` at once, as one agent step."""
+    return tools + [ParallelToolCallsTool(tools=tools)]
+
 @CrewBase
 class CrewaiFinAgent():
     """CrewaiFinAgent crew"""
@@ -22,24 +32,29 @@ class CrewaiFinAgent():
         return Agent(
             config=self.agents_config['financial_data_agent'],
             verbose=True,
-            tools=[
+            tools=with_parallel_calls([
                 StockPriceTool(),
                 CompanyProfileTool(),
                 FinancialRatiosTool(),
                 MarketCapTool(),
                 KeyMetricsTool(),
                 StockScreenerTool(),
-                SingleLineItemQueryTool()
-            ]
+                SingleLineItemQueryTool(),
+                StockPricesTool(),
+                CompanyProfilesTool(),
+                MarketCapsTool()
+            ])
         )
     
     @agent
     def web_scraping_agent(self) -> Agent:
         return Agent(
             config=self.agents_config['web_scraping_agent'],
-            tools=[
-                WebpageReadingTool()
-            ]
+            tools=with_parallel_calls([
+                WebpageReadingTool(),
+                WebpagesReadingTool(),
+                DocumentReadingTool()
+            ])
         )
     
     @agent
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
+import argparse
 import sys
 import warnings
 from typing import Dict, Any
 
+from cassette import cassette
 from crew import CrewaiFinAgent
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
@@ -37,10 +39,21 @@ def interactive_mode():
         print(f"Response: {response}\n")
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        # If command line argument is provided, use it as the query
-        query = " ".join(sys.argv[1:])
-        print(run(query))
-    else:
-        # If no arguments, run in interactive mode
-        interactive_mode()
+    parser = argparse.ArgumentParser(description="Financial Assistant")
+    parser.add_argument("query", nargs="*", help="Question to answer; omit for interactive mode")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record all FMP, web and model calls to a cassette file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Replay FMP, web and model calls from a cassette file")
+    args = parser.parse_args()
+
+    if args.record and args.replay:
+        print("Error: Cannot specify both --record and --replay")
+        sys.exit(1)
+    cassette_mode = "record" if args.record else "replay" if args.replay else None
+
+    with cassette(cassette_mode, args.record or args.replay):
+        if args.query:
+            # If command line argument is provided, use it as the query
+            print(run(" ".join(args.query)))
+        else:
+            # If no arguments, run in interactive mode
+            interactive_mode()
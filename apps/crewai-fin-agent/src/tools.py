@@ -1,78 +1,63 @@
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from crewai.tools import BaseTool
-from typing import Type, List, Dict, Any, Optional, Literal
+from typing import Type, List, Dict, Any, Optional, Literal, Union
 from pydantic import BaseModel, Field
-import json
-import time
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-import certifi
-from dotenv import load_dotenv
-import os
-import requests
-from bs4 import BeautifulSoup
-
-# Helper function remains the same
+
+from concurrency import get_tool_pool
+from documents import get_document_library
+from fmp import get_fmp_client
+from formatting import OutputFormat, format_output
+from web import get_web_reader
+
 def _fmp_request(endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
-    """Make a request to the FMP API with retry logic."""
-    load_dotenv()
-    try:
-        fmp_api_key = os.getenv('FMP_API_KEY')
-        base_url = "https://financialmodelingprep.com/api/v3"
-    except Exception as e:
-        print(f"No FMP_API_KEY found. You can get an API key at https://site.financialmodelingprep.com/: {e}")
-        return {"error": f"Error loading FMP API Key: {e}"}
-    
-    if params is None:
-        params = {}
-    params['apikey'] = fmp_api_key
-    url = f"{base_url}/{endpoint}?{urlencode(params)}"
-    
-    for attempt in range(max_retries):
-        try:
-            request = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urlopen(request, cafile=certifi.where())
-            data = response.read().decode("utf-8")
-
-            if not data:
-                print(f"Attempt {attempt + 1}: No data returned from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "No data returned from API"}
-            
-            results = json.loads(data)
-            if not results:
-                print(f"Attempt {attempt + 1}: Empty response from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "Empty response from API"}
-            
-            if isinstance(results, dict) and "Error Message" in results:
-                print(f"API Error: {results['Error Message']}")
-                return {"error": results["Error Message"]}
-            
-            return results
-        except HTTPError as e:
-            if e.code == 403:
-                print("HTTP Error 403: API access forbidden. Please check your API key.")
-                return {"error": "API access forbidden. Please check your API key."}
-            else:
-                print(f"HTTP Error {e.code}: {e.reason}")
-                return {"error": f"HTTP Error {e.code}: {e.reason}"}
-        except URLError as e:
-            print(f"URL Error: {e.reason}")
-            return {"error": f"URL Error: {e.reason}"}
-        except json.JSONDecodeError:
-            print("Invalid JSON response from API")
-            return {"error": "Invalid JSON response from API"}
-        except Exception as e:
-            print(f"An unexpected error occurred: {str(e)}")
-            return {"error": f"An unexpected error occurred: {str(e)}"}
-    
-    print(f"No valid data after {max_retries} attempts")
-    return {"error": f"No valid data after {max_retries} attempts"}
+    """Make a request to the FMP API through the shared pooled client."""
+    return get_fmp_client().request(endpoint, params, max_retries=max_retries)
+
+MAX_BATCH_SYMBOLS = 50
+MAX_BATCH_WORKERS = 5
+
+PROFILE_SUMMARY_FIELDS = [
+    "companyName", "price", "mktCap", "beta", "currency", "exchangeShortName",
+    "sector", "industry", "country", "ceo", "fullTimeEmployees", "ipoDate",
+]
+
+def _normalize_symbols(symbols: List[str]) -> List[str]:
+    """Upper-case and de-duplicate symbols, keeping their order."""
+    seen = []
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen[:MAX_BATCH_SYMBOLS]
+
+def _fmp_batch_request(endpoint: str, symbols: List[str]) -> Dict[str, Any]:
+    """Fetch a comma-separated symbol list in one request, keyed by symbol."""
+    data = _fmp_request(f"{endpoint}/{','.join(symbols)}")
+    if "error" in data:
+        return {symbol: data for symbol in symbols}
+    return {item["symbol"]: item for item in data if "symbol" in item}
+
+def _fmp_map_symbols(fn, symbols: List[str]) -> Dict[str, Any]:
+    """Run a per-symbol function on a bounded thread pool, keyed by symbol."""
+    with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(symbols) or 1)) as executor:
+        return dict(zip(symbols, executor.map(fn, symbols)))
+
+PERIOD_ID_FIELDS = ["symbol", "date", "calendarYear", "period"]
+
+def _trim_periods(data: List[dict], fields: Optional[List[str]] = None, limit: Optional[int] = None) -> List[dict]:
+    """Keep only the most recent `limit` periods and the requested `fields` of each."""
+    if "error" in data:
+        return data
+    rows = data[:limit] if limit else data
+    if not fields:
+        return rows
+    wanted = PERIOD_ID_FIELDS + [f for f in fields if f not in PERIOD_ID_FIELDS]
+    trimmed = []
+    for row in rows:
+        keys = {k.lower(): k for k in row}
+        trimmed.append({keys[f.lower()]: row[keys[f.lower()]] for f in wanted if f.lower() in keys})
+    return trimmed
 
 class LineItemQueryInput(BaseModel):
     """Input schema for generating single line item queries."""
@@ -85,18 +70,40 @@ class LineItemQueryInput(BaseModel):
         default="annual",
         description="Period of the financial statement"
     )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Only return these fields of each period, e.g. ['netIncome']"
+    )
+    limit: Optional[int] = Field(
+        default=None,
+        description="Only return this many of the most recent periods"
+    )
+    output_format: OutputFormat = Field(
+        default="json",
+        description="'json' for a list of records or 'table' for a compact CSV table"
+    )
 
 class SingleLineItemQueryTool(BaseTool):
     name: str = "Generate Single Line Item Query"
     description: str = "Generate a single line item query for a given ticker's financial statements"
     args_schema: Type[BaseModel] = LineItemQueryInput
 
-    def _run(self, ticker: str, statement: str = "income-statement", period: str = "annual") -> List[dict]:
+    def _run(
+        self,
+        ticker: str,
+        statement: str = "income-statement",
+        period: str = "annual",
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        output_format: OutputFormat = "json",
+    ) -> Union[List[dict], str]:
         params = {"period": period}
+        if limit:
+            params["limit"] = limit
         result = _fmp_request(f"{statement}/{ticker}", params)
         if "error" in result:
             return [result]
-        return result
+        return format_output(_trim_periods(result, fields, limit), output_format)
 
 class StockPriceInput(BaseModel):
     """Input schema for stock price queries."""
@@ -135,15 +142,36 @@ class FinancialRatiosInput(BaseModel):
         default="annual",
         description="Period of the financial ratios"
     )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Only return these fields of each period, e.g. ['debtEquityRatio']"
+    )
+    limit: Optional[int] = Field(
+        default=None,
+        description="Only return this many of the most recent periods"
+    )
+    output_format: OutputFormat = Field(
+        default="json",
+        description="'json' for a list of records or 'table' for a compact CSV table"
+    )
 
 class FinancialRatiosTool(BaseTool):
     name: str = "Get Financial Ratios"
     description: str = "Fetch financial ratios for a given symbol"
     args_schema: Type[BaseModel] = FinancialRatiosInput
 
-    def _run(self, symbol: str, period: str = "annual") -> List[dict]:
+    def _run(
+        self,
+        symbol: str,
+        period: str = "annual",
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        output_format: OutputFormat = "json",
+    ) -> Union[List[dict], str]:
         params = {"period": period}
-        return _fmp_request(f"ratios/{symbol}", params)
+        if limit:
+            params["limit"] = limit
+        return format_output(_trim_periods(_fmp_request(f"ratios/{symbol}", params), fields, limit), output_format)
 
 class MarketCapInput(BaseModel):
     """Input schema for market cap queries."""
@@ -158,6 +186,66 @@ class MarketCapTool(BaseTool):
         data = _fmp_request(f"market-capitalization/{symbol}")
         return data[0] if data else {"error": "No market cap data available"}
 
+class MultiSymbolInput(BaseModel):
+    """Input schema for multi-symbol queries."""
+    symbols: List[str] = Field(..., description="The stock ticker symbols, e.g. ['TSLA', 'F', 'GM']")
+    output_format: OutputFormat = Field(
+        default="json",
+        description="'json' for a list of records or 'table' for a compact CSV table"
+    )
+
+class StockPricesTool(BaseTool):
+    name: str = "Get Stock Prices"
+    description: str = "Fetch the current stock prices for several symbols in a single call"
+    args_schema: Type[BaseModel] = MultiSymbolInput
+
+    def _run(self, symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+        symbols = _normalize_symbols(symbols)
+        quotes = _fmp_batch_request("quote-short", symbols)
+        prices = {}
+        for symbol in symbols:
+            quote = quotes.get(symbol)
+            if quote is None:
+                prices[symbol] = {"error": "No price data available"}
+            elif "error" in quote:
+                prices[symbol] = quote
+            else:
+                prices[symbol] = {"price": quote["price"]}
+        return format_output(prices, output_format)
+
+class CompanyProfilesTool(BaseTool):
+    name: str = "Get Company Profiles"
+    description: str = "Fetch a compact company profile for several symbols in a single call"
+    args_schema: Type[BaseModel] = MultiSymbolInput
+
+    def _run(self, symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+        symbols = _normalize_symbols(symbols)
+        profiles = _fmp_batch_request("profile", symbols)
+        summaries = {}
+        for symbol in symbols:
+            profile = profiles.get(symbol)
+            if profile is None:
+                summaries[symbol] = {"error": "No company profile data available"}
+            elif "error" in profile:
+                summaries[symbol] = profile
+            else:
+                summaries[symbol] = {k: profile.get(k) for k in PROFILE_SUMMARY_FIELDS}
+        return format_output(summaries, output_format)
+
+class MarketCapsTool(BaseTool):
+    name: str = "Get Market Caps"
+    description: str = "Fetch the current market cap for several symbols in a single call"
+    args_schema: Type[BaseModel] = MultiSymbolInput
+
+    def _run(self, symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+        def market_cap(symbol: str) -> dict:
+            data = _fmp_request(f"market-capitalization/{symbol}")
+            if "error" in data:
+                return data
+            return {"marketCap": data[0]["marketCap"], "date": data[0]["date"]} if data else {"error": "No market cap data available"}
+
+        return format_output(_fmp_map_symbols(market_cap, _normalize_symbols(symbols)), output_format)
+
 class KeyMetricsInput(BaseModel):
     """Input schema for key metrics queries."""
     symbol: str = Field(..., description="The stock ticker symbol")
@@ -165,15 +253,36 @@ class KeyMetricsInput(BaseModel):
         default="annual",
         description="Period of the key metrics"
     )
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Only return these fields of each period, e.g. ['peRatio']"
+    )
+    limit: Optional[int] = Field(
+        default=None,
+        description="Only return this many of the most recent periods"
+    )
+    output_format: OutputFormat = Field(
+        default="json",
+        description="'json' for a list of records or 'table' for a compact CSV table"
+    )
 
 class KeyMetricsTool(BaseTool):
     name: str = "Get Key Metrics"
     description: str = "Fetch key metrics for a given symbol"
     args_schema: Type[BaseModel] = KeyMetricsInput
 
-    def _run(self, symbol: str, period: str = "annual") -> List[dict]:
+    def _run(
+        self,
+        symbol: str,
+        period: str = "annual",
+        fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        output_format: OutputFormat = "json",
+    ) -> Union[List[dict], str]:
         params = {"period": period}
-        return _fmp_request(f"key-metrics/{symbol}", params)
+        if limit:
+            params["limit"] = limit
+        return format_output(_trim_periods(_fmp_request(f"key-metrics/{symbol}", params), fields, limit), output_format)
 
 class StockScreenerInput(BaseModel):
     """Input schema for stock screener."""
@@ -195,6 +304,10 @@ class StockScreenerInput(BaseModel):
     country: Optional[str] = Field(None, description="Filter by country")
     exchange: Optional[str] = Field(None, description="Filter by exchange")
     limit: int = Field(default=10, description="Maximum number of results to return")
+    output_format: OutputFormat = Field(
+        default="json",
+        description="'json' for a list of records or 'table' for a compact CSV table"
+    )
 
 class StockScreenerTool(BaseTool):
     name: str = "Stock Screener"
@@ -220,55 +333,124 @@ class StockScreenerTool(BaseTool):
         industry: Optional[str] = None,
         country: Optional[str] = None,
         exchange: Optional[str] = None,
-        limit: int = 10
-    ) -> List[Dict[str, Any]]:
-        params = {k: v for k, v in locals().items() if v is not None and k != 'self'}
+        limit: int = 10,
+        output_format: OutputFormat = "json",
+    ) -> Union[List[Dict[str, Any]], str]:
+        params = {k: v for k, v in locals().items() if v is not None and k not in ('self', 'output_format')}
         
         # Convert boolean values to strings
         for key in ['is_etf', 'is_fund', 'is_actively_trading']:
             if key in params:
                 params[key] = str(params[key]).lower()
 
-        return _fmp_request("stock-screener", params) 
+        return format_output(_fmp_request("stock-screener", params), output_format)
     
 
 class WebpageReadingInput(BaseModel):
     """Input schema for web scraping."""
     url: str = Field(..., description="The URL of the website to scrape")
+    main_content: bool = Field(
+        default=False,
+        description="Return only the article body, without navigation, banners, footers or related links"
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="The question being researched; if set, only the passages of the page most relevant to it are returned"
+    )
 
 class WebpageReadingTool(BaseTool):
     name: str = "Web Scraping"
-    description: str = "Read a given website and extract the text content"
+    description: str = (
+        "Read a given website and extract the text content. Set main_content for news articles, "
+        "press releases and blog posts; keep the full text for pages whose data sits in tables or lists. "
+        "Pass a query to get only the most relevant passages, which also finds figures deep inside long pages"
+    )
     args_schema: Type[BaseModel] = WebpageReadingInput
 
-    def _run(self, url: str) -> str:
-        try:
-            # Send GET request with a user agent to avoid blocking
-            print(f"Agent visiting webpage: {url}")
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-
-            # Parse HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-
-            # Extract text content
-            text = soup.get_text(separator='\n', strip=True)
-
-            # Clean up text (remove excessive newlines and spaces)
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-
-            return text[:50000]  # Limit response size to 50k characters
-
-        except requests.RequestException as e:
-            return f"Error fetching the webpage: {str(e)}"
-        except Exception as e:
-            return f"Error processing the webpage: {str(e)}"
\ No newline at end of file
+    def _run(self, url: str, main_content: bool = False, query: Optional[str] = None) -> str:
+        return get_web_reader().read(url, main_content=main_content, query=query)
+
+class WebpagesReadingInput(BaseModel):
+    """Input schema for reading several websites."""
+    urls: List[str] = Field(..., description="The URLs of the websites to scrape")
+    timeout: float = Field(default=10, description="Timeout in seconds for each URL")
+    main_content: bool = Field(
+        default=False,
+        description="Return only the article body of each page, without navigation, banners, footers or related links"
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="The question being researched; if set, only the passages of each page most relevant to it are returned"
+    )
+
+class WebpagesReadingTool(BaseTool):
+    name: str = "Web Scraping Multiple Pages"
+    description: str = "Read several websites concurrently and extract the text content of each, keyed by URL"
+    args_schema: Type[BaseModel] = WebpagesReadingInput
+
+    def _run(
+        self, urls: List[str], timeout: float = 10, main_content: bool = False, query: Optional[str] = None
+    ) -> Dict[str, str]:
+        return get_web_reader().read_many(urls, timeout=timeout, main_content=main_content, query=query)
+
+class DocumentReadingInput(BaseModel):
+    """Input schema for reading local filings."""
+    path: str = Field(..., description="Path of the document, relative to the documents directory")
+    section: Optional[str] = Field(
+        default=None,
+        description="Section to read, e.g. 'Item 7', '7A', 'Part II Item 1A', 'Risk Factors' or 'MD&A'; omit to list the sections"
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="The question being researched; if set, only the passages of the section (or of the whole document "
+        "when no section is given) most relevant to it are returned"
+    )
+
+class DocumentReadingTool(BaseTool):
+    name: str = "Read Document"
+    description: str = (
+        "Read a local filing or report (e.g. a 10-K or 10-Q). Without a section it lists the document's sections "
+        "and their sizes; with a section it returns that section's text. An unknown path lists the available documents"
+    )
+    args_schema: Type[BaseModel] = DocumentReadingInput
+
+    def _run(self, path: str, section: Optional[str] = None, query: Optional[str] = None) -> str:
+        return get_document_library().read(path, section=section, query=query)
+
+class ToolCall(BaseModel):
+    """One call of another tool."""
+    tool: str = Field(..., description="Name of the tool to call, e.g. 'Get Financial Ratios'")
+    arguments: Dict[str, Any] = Field(default_factory=dict, description="Arguments of the tool call")
+
+class ParallelToolCallsInput(BaseModel):
+    """Input schema for running several tool calls at once."""
+    calls: List[ToolCall] = Field(..., description="Independent tool calls to run at the same time")
+
+class ParallelToolCallsTool(BaseTool):
+    name: str = "Run Tools In Parallel"
+    description: str = (
+        "Run several independent calls of your other tools at the same time, e.g. the financial ratios of "
+        "TSLA, F and GM, instead of one after the other. Returns the result of each call in the order given"
+    )
+    args_schema: Type[BaseModel] = ParallelToolCallsInput
+    tools: List[BaseTool] = Field(default_factory=list, exclude=True)
+
+    def _run(self, calls: List[Union[ToolCall, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        tools = {tool.name.lower(): tool for tool in self.tools}
+        calls = [ToolCall.model_validate(call) if isinstance(call, dict) else call for call in calls]
+
+        def run(call: ToolCall, tool: Optional[BaseTool]) -> Any:
+            if tool is None:
+                return {"error": f"Unknown tool {call.tool!r}, expected one of: {', '.join(t.name for t in self.tools)}"}
+            try:
+                arguments = tool.args_schema.model_validate(call.arguments).model_dump()
+                return tool.run(**arguments)
+            except Exception as e:
+                return {"error": f"{tool.name} failed: {str(e)}"}
+
+        # The pool's per-tool caps are keyed by the canonical name, not by how the call spelled it.
+        resolved = [(call, tools.get(call.tool.lower())) for call in calls]
+        results = get_tool_pool().map(
+            [(tool.name if tool else call.tool, functools.partial(run, call, tool)) for call, tool in resolved]
+        )
+        return [{"tool": call.tool, "result": result} for call, result in zip(calls, results)]
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# metric -> ((dataset, numerator field), (dataset, denominator field))
+RATIO_METRICS = {
+    "gross_margin": (("income-statement", "grossProfit"), ("income-statement", "revenue")),
+    "operating_margin": (("income-statement", "operatingIncome"), ("income-statement", "revenue")),
+    "net_margin": (("income-statement", "netIncome"), ("income-statement", "revenue")),
+    "free_cash_flow_margin": (("cash-flow-statement", "freeCashFlow"), ("income-statement", "revenue")),
+    "return_on_equity": (("income-statement", "netIncome"), ("balance-sheet-statement", "totalStockholdersEquity")),
+    "return_on_assets": (("income-statement", "netIncome"), ("balance-sheet-statement", "totalAssets")),
+    "debt_to_equity": (("balance-sheet-statement", "totalDebt"), ("balance-sheet-statement", "totalStockholdersEquity")),
+    "current_ratio": (("balance-sheet-statement", "totalCurrentAssets"), ("balance-sheet-statement", "totalCurrentLiabilities")),
+}
+# metric -> (dataset, field) whose period-over-period change is computed
+GROWTH_METRICS = {
+    "revenue_growth": ("income-statement", "revenue"),
+    "net_income_growth": ("income-statement", "netIncome"),
+    "eps_growth": ("income-statement", "eps"),
+    "free_cash_flow_growth": ("cash-flow-statement", "freeCashFlow"),
+}
+METRICS = tuple(RATIO_METRICS) + tuple(GROWTH_METRICS)
+
+Loader = Callable[[str, str, str, Optional[int]], Any]
+
+
+def _datasets_for(metric: str) -> List[str]:
+    if metric in RATIO_METRICS:
+        return [dataset for dataset, _ in RATIO_METRICS[metric]]
+    return [GROWTH_METRICS[metric][0]]
+
+
+def _matrix(data: Dict[tuple, Any], symbols: List[str], dataset: str, field: str, width: int) -> np.ndarray:
+    """Stack one field into a (symbols x periods) array, newest period first, NaN where missing."""
+    matrix = np.full((len(symbols), width), np.nan)
+    for i, symbol in enumerate(symbols):
+        rows = data.get((dataset, symbol))
+        if not isinstance(rows, list):
+            continue
+        for j, row in enumerate(rows[:width]):
+            value = row.get(field)
+            if isinstance(value, (int, float)):
+                matrix[i, j] = value
+    return matrix
+
+
+def _rank_descending(values: np.ndarray) -> np.ndarray:
+    """1 for the highest value, NaN entries are left unranked (0)."""
+    ranks = np.zeros(len(values), dtype=int)
+    valid = np.flatnonzero(~np.isnan(values))
+    order = valid[np.argsort(-values[valid], kind="stable")]
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def compare_metrics(
+    symbols: List[str],
+    metrics: List[str],
+    load: Loader,
+    period: str = "annual",
+    years: int = 5,
+    max_workers: int = 5,
+) -> List[Dict[str, Any]]:
+    """Compute metrics for several companies at once and rank them.
+
+    Statement data for every (dataset, symbol) pair is loaded concurrently,
+    then each metric is evaluated over a (symbols x periods) array in one
+    vectorized pass. Periods are aligned by recency, i.e. the most recent
+    report of each company is compared with the most recent of the others.
+
+    Returns one row per symbol with the latest value of each metric, its
+    average over `years` periods and its rank (1 = highest latest value),
+    sorted by the rank of the first metric.
+    """
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown:
+        return [{"error": f"Unknown metrics: {', '.join(unknown)}. Supported: {', '.join(METRICS)}"}]
+
+    datasets = sorted({dataset for metric in metrics for dataset in _datasets_for(metric)})
+    keys = [(dataset, symbol) for dataset in datasets for symbol in symbols]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(keys) or 1)) as executor:
+        loaded = executor.map(lambda key: load(key[0], key[1], period, years + 1), keys)
+        data = dict(zip(keys, loaded))
+
+    rows: List[Dict[str, Any]] = []
+    for symbol in symbols:
+        row: Dict[str, Any] = {"symbol": symbol}
+        for dataset in datasets:
+            result = data[(dataset, symbol)]
+            if isinstance(result, list) and result:
+                row.setdefault("date", result[0].get("date"))
+            elif isinstance(result, dict) and "error" in result:
+                row["error"] = result["error"]
+        rows.append(row)
+
+    ranks = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for metric in metrics:
+            if metric in RATIO_METRICS:
+                (num_dataset, num_field), (den_dataset, den_field) = RATIO_METRICS[metric]
+                values = (
+                    _matrix(data, symbols, num_dataset, num_field, years)
+                    / _matrix(data, symbols, den_dataset, den_field, years)
+                )
+            else:
+                dataset, field = GROWTH_METRICS[metric]
+                series = _matrix(data, symbols, dataset, field, years + 1)
+                values = series[:, :-1] / np.abs(series[:, 1:]) - np.sign(series[:, 1:])
+            values[~np.isfinite(values)] = np.nan
+
+            counts = np.sum(~np.isnan(values), axis=1)
+            averages = np.where(counts > 0, np.nansum(values, axis=1) / np.maximum(counts, 1), np.nan)
+            latest = values[:, 0]
+            ranks[metric] = _rank_descending(latest)
+
+            for i, row in enumerate(rows):
+                row[metric] = None if np.isnan(latest[i]) else float(latest[i])
+                row[f"{metric}_avg"] = None if np.isnan(averages[i]) else float(averages[i])
+                row[f"{metric}_rank"] = int(ranks[metric][i]) or None
+
+    first = ranks[metrics[0]] if metrics else np.zeros(len(rows), dtype=int)
+    order = sorted(range(len(rows)), key=lambda i: (first[i] == 0, first[i]))
+    return [rows[i] for i in order]
@@ -0,0 +1,388 @@
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+DEFAULT_KEEP_CHECKPOINTS = 10
+DEFAULT_TTL_HOURS = 7 * 24
+DEFAULT_VACUUM_SECONDS = 300
+# Serialized values larger than this are stored zlib-compressed.
+COMPRESS_MIN_BYTES = 512
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT, updated REAL,
+    versions TEXT, type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated ON checkpoints (thread_id, updated);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, type TEXT, value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+    channel TEXT, type TEXT, value BLOB, task_path TEXT,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpointer backed by a SQLite file.
+
+    Checkpoints survive restarts, and several processes can share the same
+    file (it uses WAL mode). As in MemorySaver, each channel value is stored
+    once per version, so a checkpoint only adds the channels that changed;
+    values are compressed with zlib.
+
+    Retention keeps the last `keep_last` root checkpoints of each thread,
+    along with the subgraph runs they refer to, and deletes threads not
+    updated for `ttl_seconds`. Pruning runs on a
+    background thread every `vacuum_seconds`, followed by an incremental
+    vacuum that returns the freed pages to the file system. `stats` counts
+    what was pruned.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        keep_last: Optional[int] = DEFAULT_KEEP_CHECKPOINTS,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_HOURS * 3600,
+        vacuum_seconds: Optional[float] = DEFAULT_VACUUM_SECONDS,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.keep_last = keep_last
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"checkpoints_pruned": 0, "threads_expired": 0, "blobs_pruned": 0, "writes_pruned": 0, "vacuums": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # Only takes effect on a new file, before any table exists.
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+
+        self._closed = threading.Event()
+        self._vacuum_thread = None
+        if vacuum_seconds:
+            self._vacuum_thread = threading.Thread(
+                target=self._vacuum_loop, args=(vacuum_seconds,), name="checkpoint-vacuum", daemon=True
+            )
+            self._vacuum_thread.start()
+
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return type_ + "+zlib", zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+zlib"):
+            type_, data = type_[: -len("+zlib")], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = checkpoint.copy()
+        values = saved.pop("channel_values")
+        blobs = [
+            (thread_id, checkpoint_ns, channel, str(version), *(self._dumps(values[channel]) if channel in values else ("empty", b"")))
+            for channel, version in new_versions.items()
+        ]
+        versions = json.dumps({channel: str(version) for channel, version in checkpoint["channel_versions"].items()})
+        row = (
+            thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"), time.time(),
+            versions, *self._dumps(saved), *self._dumps(metadata),
+        )
+        with self._lock:
+            with self._transaction():
+                self._db.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+                self._db.execute("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        special, regular = [], []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, *self._dumps(value), task_path)
+            (special if idx < 0 else regular).append(row)
+        # Special writes (errors, interrupts) replace earlier ones, regular writes are only stored once.
+        with self._lock:
+            with self._transaction():
+                self._db.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special)
+                self._db.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        """The checkpoint given by `config`, or the latest checkpoint of its thread."""
+        configurable = {**config["configurable"], "checkpoint_ns": config["configurable"].get("checkpoint_ns", "")}
+        return next(self.list({"configurable": configurable}, limit=1), None)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            conditions.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+            f"FROM checkpoints {'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+            "ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+        )
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata_data in rows:
+            if limit is not None and limit <= 0:
+                break
+            metadata = self._loads(metadata_type, metadata_data)
+            if filter and not all(metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(thread_id, checkpoint_ns, checkpoint_id, parent_id, self._loads(type_, data), metadata)
+
+    def _tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str, parent_id: Optional[str], checkpoint: Checkpoint, metadata: CheckpointMetadata
+    ) -> CheckpointTuple:
+        with self._lock:
+            blobs = self._db.execute(
+                "SELECT b.channel, b.type, b.value FROM json_each(?) v JOIN blobs b ON b.thread_id = ?"
+                " AND b.checkpoint_ns = ? AND b.channel = v.key AND b.version = v.value",
+                (json.dumps({c: str(v) for c, v in checkpoint["channel_versions"].items()}), thread_id, checkpoint_ns),
+            ).fetchall()
+            writes = self._db.execute(
+                "SELECT task_id, channel, type, value FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+                " ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+        channel_values = {channel: self._loads(type_, value) for channel, type_, value in blobs if type_ != "empty"}
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=metadata,
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            pending_writes=[(task_id, channel, self._loads(type_, value)) for task_id, channel, type_, value in writes],
+        )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            with self._transaction():
+                for table in ("checkpoints", "blobs", "writes"):
+                    self._db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def prune(self) -> Dict[str, int]:
+        """Apply the retention policy now; returns what was deleted."""
+        pruned = {"checkpoints_pruned": 0, "threads_expired": 0, "blobs_pruned": 0, "writes_pruned": 0}
+        with self._lock:
+            with self._transaction():
+                if self.ttl_seconds:
+                    expired = [
+                        thread_id
+                        for (thread_id,) in self._db.execute(
+                            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated) < ?",
+                            (time.time() - self.ttl_seconds,),
+                        ).fetchall()
+                    ]
+                    for thread_id in expired:
+                        for table in ("checkpoints", "blobs", "writes"):
+                            self._db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                    pruned["threads_expired"] = len(expired)
+                if self.keep_last:
+                    pruned["checkpoints_pruned"] = self._db.execute(
+                        "DELETE FROM checkpoints WHERE rowid IN (SELECT rowid FROM ("
+                        " SELECT rowid, ROW_NUMBER() OVER (PARTITION BY thread_id ORDER BY checkpoint_id DESC) AS age"
+                        " FROM checkpoints WHERE checkpoint_ns = '') WHERE age > ?)",
+                        (self.keep_last,),
+                    ).rowcount
+                pruned["writes_pruned"] = self._db.execute(
+                    "DELETE FROM writes WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id"
+                    " AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)"
+                ).rowcount
+                if self.keep_last:
+                    pruned["checkpoints_pruned"] += self._prune_subgraphs()
+                # Channel values no remaining checkpoint refers to.
+                pruned["blobs_pruned"] = self._db.execute(
+                    "DELETE FROM blobs WHERE NOT EXISTS (SELECT 1 FROM checkpoints c, json_each(c.versions) v"
+                    " WHERE c.thread_id = blobs.thread_id AND c.checkpoint_ns = blobs.checkpoint_ns"
+                    " AND v.key = blobs.channel AND v.value = blobs.version)"
+                ).rowcount
+            for key, count in pruned.items():
+                self.stats[key] += count
+        return pruned
+
+    def _prune_subgraphs(self) -> int:
+        """Delete the checkpoints of subgraph runs that no remaining root checkpoint refers to.
+
+        A subgraph run inside a node is stored under the namespace
+        "<node>:<task_id>", and the parent records the task's writes against
+        its own checkpoint. Once that checkpoint is pruned, so are the writes,
+        and the namespace is unreferenced. Namespaces updated after the
+        thread's latest root checkpoint belong to a running task and are kept.
+        """
+        referenced = set(self._db.execute("SELECT DISTINCT thread_id, task_id FROM writes WHERE checkpoint_ns = ''"))
+        latest = dict(self._db.execute("SELECT thread_id, MAX(updated) FROM checkpoints WHERE checkpoint_ns = '' GROUP BY thread_id"))
+        unreferenced = [
+            (thread_id, checkpoint_ns)
+            for thread_id, checkpoint_ns, updated in self._db.execute(
+                "SELECT thread_id, checkpoint_ns, MAX(updated) FROM checkpoints WHERE checkpoint_ns != ''"
+                " GROUP BY thread_id, checkpoint_ns"
+            ).fetchall()
+            if (thread_id, checkpoint_ns.split("|")[0].rpartition(":")[2]) not in referenced
+            and updated < latest.get(thread_id, float("inf"))
+        ]
+        deleted = 0
+        for thread_id, checkpoint_ns in unreferenced:
+            deleted += self._db.execute(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+            ).rowcount
+            self._db.execute("DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns))
+        return deleted
+
+    def vacuum(self) -> None:
+        """Prune, then release free pages and truncate the write-ahead log."""
+        self.prune()
+        with self._lock:
+            # execute() steps the pragma once, freeing a single page; executescript runs it to the end.
+            self._db.executescript("PRAGMA incremental_vacuum;")
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self.stats["vacuums"] += 1
+
+    def _vacuum_loop(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            try:
+                self.vacuum()
+            except sqlite3.Error as e:
+                print(f"Checkpoint vacuum failed: {e}")
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def close(self) -> None:
+        self._closed.set()
+        if self._vacuum_thread is not None:
+            self._vacuum_thread.join()
+        with self._lock:
+            self._db.close()
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """Checkpointer for `build_app`: SQLite at FIN_CHECKPOINT_PATH if set, else in memory."""
+    load_dotenv()
+    path = os.getenv("FIN_CHECKPOINT_PATH")
+    if not path:
+        return MemorySaver()
+    return SQLiteCheckpointSaver(
+        path,
+        keep_last=int(os.getenv("FIN_CHECKPOINT_KEEP", str(DEFAULT_KEEP_CHECKPOINTS))),
+        ttl_seconds=float(os.getenv("FIN_CHECKPOINT_TTL_HOURS", str(DEFAULT_TTL_HOURS))) * 3600,
+        vacuum_seconds=float(os.getenv("FIN_CHECKPOINT_VACUUM_SECONDS", str(DEFAULT_VACUUM_SECONDS))),
+    )
@@ -0,0 +1,100 @@
+import asyncio
+import contextlib
+import os
+import threading
+import weakref
+from collections import Counter
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.tools import BaseTool
+
+DEFAULT_TOOL_WORKERS = 8
+# Tools that fan out on their own or parse large documents get a lower cap.
+DEFAULT_TOOL_LIMITS = {"read_webpages": 2, "read_document": 2, "compare_companies": 2}
+
+
+def parse_limits(value: Optional[str]) -> Dict[str, int]:
+    """Parse per-tool caps given as "tool=2,other_tool=1"."""
+    limits = {}
+    for item in (value or "").split(","):
+        name, _, limit = item.rpartition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+class ToolPool:
+    """Bounds the tool calls running at once, overall and per tool.
+
+    The agents' ToolNode already awaits all tool calls of one model message
+    together and returns their results in call order; tools wrapped with
+    `wrap` additionally wait for a slot, so that at most `max_workers` calls
+    run at once and at most `limits[name]` calls of a given tool. Slots are
+    shared by every session on the event loop. `stats` counts the calls and
+    the calls that waited for a tool's cap.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_TOOL_WORKERS, limits: Optional[Dict[str, int]] = None):
+        self.max_workers = max_workers
+        self.limits = dict(limits or {})
+        self.stats: Dict[str, int] = Counter()
+        self._lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple]" = weakref.WeakKeyDictionary()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _loop_semaphores(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Semaphore]]:
+        loop = asyncio.get_running_loop()
+        semaphores = self._semaphores.get(loop)
+        if semaphores is None:
+            semaphores = self._semaphores[loop] = (
+                asyncio.Semaphore(self.max_workers),
+                {name: asyncio.Semaphore(limit) for name, limit in self.limits.items()},
+            )
+        return semaphores
+
+    @contextlib.asynccontextmanager
+    async def slot(self, name: str) -> AsyncIterator[None]:
+        """Hold a slot for one call of tool `name`."""
+        overall, per_tool = self._loop_semaphores()
+        self._count("calls")
+        tool_semaphore = per_tool.get(name)
+        async with contextlib.AsyncExitStack() as stack:
+            if tool_semaphore is not None:
+                if tool_semaphore.locked():
+                    self._count("capped")
+                # Wait for the tool's cap first, so waiting calls hold no overall slot.
+                await stack.enter_async_context(tool_semaphore)
+            await stack.enter_async_context(overall)
+            yield
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """Copy of an async tool whose calls wait for a slot."""
+        coroutine = tool.coroutine
+
+        async def limited(*args, **kwargs):
+            async with self.slot(tool.name):
+                return await coroutine(*args, **kwargs)
+
+        return tool.model_copy(update={"coroutine": limited})
+
+
+_pool: Optional[ToolPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_tool_pool() -> ToolPool:
+    """Return the process-wide tool pool, sized by FIN_TOOL_WORKERS and FIN_TOOL_LIMITS."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                load_dotenv()
+                _pool = ToolPool(
+                    max_workers=int(os.getenv("FIN_TOOL_WORKERS", str(DEFAULT_TOOL_WORKERS))),
+                    limits={**DEFAULT_TOOL_LIMITS, **parse_limits(os.getenv("FIN_TOOL_LIMITS"))},
+                )
+    return _pool
@@ -0,0 +1,54 @@
+import csv
+import io
+from typing import Any, Dict, List, Literal, Union
+
+OutputFormat = Literal["json", "table"]
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ""
+        if abs(value) >= 1000:
+            return str(round(value))
+        return f"{value:.4f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def to_table(rows: List[Dict[str, Any]]) -> str:
+    """Serialize rows as CSV with a single header row.
+
+    Columns that are empty in every row are dropped, null cells are left blank
+    and floats are rounded, which roughly halves the size of FMP's JSON.
+    """
+    columns: List[str] = []
+    for row in rows:
+        for key, value in row.items():
+            if key not in columns and value not in (None, ""):
+                columns.append(key)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(
+            "" if row.get(column) is None else _format_value(row[column]) for column in columns
+        )
+    return buffer.getvalue()
+
+
+def format_output(data: Union[List[dict], Dict[str, Any]], output_format: OutputFormat = "json") -> Union[List[dict], Dict[str, Any], str]:
+    """Return tool data unchanged for "json", or as a compact table for "table".
+
+    Results keyed by symbol become one row per symbol. Error results are never
+    converted.
+    """
+    if output_format != "table" or (isinstance(data, dict) and "error" in data):
+        return data
+    if isinstance(data, dict):
+        rows = [{"symbol": symbol, **values} for symbol, values in data.items()]
+    else:
+        rows = list(data)
+    return to_table(rows)
@@ -1,7 +1,7 @@
 import os
 import functools
 import operator
-from typing import Annotated, Literal, Sequence, TypedDict
+from typing import Annotated, List, Literal, Sequence, TypedDict
 
 from dotenv import load_dotenv
 from langchain_core.messages import BaseMessage, AIMessage
@@ -9,9 +9,13 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, START, StateGraph
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
-from pydantic import BaseModel
+from langgraph.types import Send
+from pydantic import BaseModel, Field
 
+from .checkpoints import get_checkpointer
+from .concurrency import get_tool_pool
+from .history import HistoryPolicy, PromptLog
+from .router import PreRouter
 from .tools import (
     get_stock_price,
     get_company_profile,
@@ -20,7 +24,13 @@ from .tools import (
     get_market_cap,
     get_stock_screener,
     generate_single_line_item_query,
+    get_stock_prices,
+    get_company_profiles,
+    get_market_caps,
+    compare_companies,
     read_webpage,
+    read_webpages,
+    read_document,
 )
 
 load_dotenv()
@@ -30,8 +40,11 @@ os.environ["LANGCHAIN_API_KEY"] = ""
 
 MEMBERS = ["Financial_Data_Agent", "Web_Research_Agent", "Output_Summarizing_Agent"]
 OPTIONS = ("FINISH",) + tuple(MEMBERS)
+WORKERS = ("Financial_Data_Agent", "Web_Research_Agent")
 
-FINANCIAL_DATA_TOOLS = [
+TOOL_POOL = get_tool_pool()
+
+FINANCIAL_DATA_TOOLS = [TOOL_POOL.wrap(tool) for tool in [
     get_stock_price,
     get_company_profile,
     get_financial_ratios,
@@ -39,11 +52,17 @@ FINANCIAL_DATA_TOOLS = [
     get_market_cap,
     get_stock_screener,
     generate_single_line_item_query,
-]
+    get_stock_prices,
+    get_company_profiles,
+    get_market_caps,
+    compare_companies,
+]]
 
-WEB_RESEARCH_TOOLS = [
+WEB_RESEARCH_TOOLS = [TOOL_POOL.wrap(tool) for tool in [
     read_webpage,
-]
+    read_webpages,
+    read_document,
+]]
 
 LLM = ChatOpenAI(model="gpt-4o-mini")
 
@@ -62,12 +81,14 @@ Agent Capabilities:
      * Access key metrics
      * Retrieve market capitalization
      * Use stock screener
+     * Compute and rank ratios and growth rates across companies
 
 2. Web_Research_Agent:
    - Scrapes and extracts information from websites
    - Capabilities:
      * Extract relevant text content from URLs
      * Gather supplementary information not available through financial APIs
+     * Read sections of local filings such as 10-Ks and 10-Qs
 
 3. Output_Summarizing_Agent:
    - Compiles and summarizes information from other agents
@@ -77,6 +98,7 @@ Your Role:
 - Analyze the user's request and the current state of the conversation.
 - Determine which agent should act next based on their specialized capabilities.
 - Use Web_Research_Agent when additional context from websites is needed.
+- When the request needs both financial data and web research that do not depend on each other, pick one as next and list the other in parallel_agents so both run at the same time.
 - Ensure all necessary data is collected before summarizing.
 - Respond with the name of the next agent to act or FINISH when the task is complete.
 """
@@ -89,6 +111,11 @@ Your tasks:
 2. Return only the raw data obtained from the tool, instead of trying to answer the query as that's handled by other agents.
 3. Do not add commentary, explanations, or infer information beyond the tool's output.
 4. Remember that data interpretation, calculation, and analysis is handled by other agents.
+5. When the query involves several companies, use the multi-symbol tools (get_stock_prices, get_company_profiles, get_market_caps) to fetch them in one call.
+6. Use the `fields` and `limit` arguments to request only the line items and periods needed for the query.
+7. Prefer output_format="table" for multi-period or multi-company data to keep responses compact.
+8. For comparisons of margins, leverage, returns or growth across companies, use compare_companies, which computes and ranks the metrics for you.
+9. Request independent data in one message with several tool calls, e.g. the ratios of several companies, so they run in parallel.
 
 Always provide the unprocessed data as your response.
 """
@@ -113,6 +140,10 @@ Your tasks:
 2. Focus on extracting key information that helps answer the user's query.
 3. Return the relevant extracted information without additional commentary.
 4. Remember that data interpretation and analysis is handled by other agents.
+5. When several pages are relevant, read them together with read_webpages instead of one at a time.
+6. For news articles, press releases and blog posts, set main_content to read only the article body.
+7. For long pages such as filings, transcripts or reports, pass the user's question as query to get only the relevant passages.
+8. For local filings, call read_document without a section to list its sections, then read only the sections you need.
 
 Always provide the extracted information as your response.
 """
@@ -120,58 +151,108 @@ Always provide the extracted information as your response.
 
 class RouteResponse(BaseModel):
     next: Literal[OPTIONS]
+    parallel_agents: List[Literal[WORKERS]] = Field(
+        default_factory=list,
+        description="Other worker agents to run at the same time as next, for independent data needs",
+    )
+
+
+HISTORY = HistoryPolicy.from_env()
+PROMPT_TOKENS = PromptLog()
+
+
+def add_messages_bounded(left: Sequence[BaseMessage], right: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Append messages, keeping only the turns allowed by the history policy."""
+    return HISTORY.trim(operator.add(list(left), list(right)))
 
 
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], operator.add]
+    messages: Annotated[Sequence[BaseMessage], add_messages_bounded]
     next: str
+    parallel_agents: List[str]
 
 
 async def agent_node(state, agent, name):
     try:
-        result = await agent.ainvoke(state)
+        messages = HISTORY.view(state["messages"])
+        result = await agent.ainvoke({**state, "messages": messages})
 
         if isinstance(result, dict) and "messages" in result:
+            PROMPT_TOKENS.record_agent_run(name, result["messages"], len(messages))
             return {
                 "messages": [
-                    AIMessage(content=result["messages"][-1].content, name=name)
+                    AIMessage(content=HISTORY.compact(result["messages"][-1].content), name=name)
                 ]
             }
-        return {"messages": [AIMessage(content=str(result), name=name)]}
+        return {"messages": [AIMessage(content=HISTORY.compact(str(result)), name=name)]}
     except Exception as e:
         return {
             "messages": [AIMessage(content=f"An error occurred: {str(e)}", name=name)]
         }
 
 
-def supervisor_agent(state):
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", ORCHESTRATOR_SYSTEM_PROMPT),
-            MessagesPlaceholder(variable_name="messages"),
-            (
-                "system",
-                "Given the conversation above, who should act next?"
-                " Or should we FINISH? Select one of: {options}",
-            ),
-        ]
-    ).partial(options=str(OPTIONS), members=", ".join(MEMBERS))
+SUPERVISOR_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", ORCHESTRATOR_SYSTEM_PROMPT),
+        MessagesPlaceholder(variable_name="messages"),
+        (
+            "system",
+            "Given the conversation above, who should act next?"
+            " Or should we FINISH? Select one of: {options}",
+        ),
+    ]
+).partial(options=str(OPTIONS), members=", ".join(MEMBERS))
 
-    supervisor_chain = prompt | LLM.with_structured_output(RouteResponse)
-    return supervisor_chain.invoke(state)
+SUPERVISOR_CHAIN = SUPERVISOR_PROMPT | LLM.with_structured_output(RouteResponse, include_raw=True)
 
+PRE_ROUTER = PreRouter()
 
-def output_summarizing_node(state):
-    """Process the state and generate a summary using the LLM."""
+
+async def supervisor_agent(state):
+    """Route with the deterministic rules when they apply, otherwise ask the LLM."""
+    if os.getenv("FIN_PREROUTER_DISABLED", "").lower() not in ("1", "true", "yes"):
+        decision = PRE_ROUTER.route(state["messages"])
+        if decision is not None:
+            return {"next": decision[0], "parallel_agents": decision[1:]}
+    else:
+        PRE_ROUTER.count("llm")
+    messages = HISTORY.view(state["messages"])
+    result = await SUPERVISOR_CHAIN.ainvoke({"messages": messages})
+    PROMPT_TOKENS.record("Supervisor_Agent", result["raw"], messages)
+    route = result["parsed"]
+    if route is None:
+        raise result["parsing_error"] or ValueError("The supervisor did not choose a route")
+    return {"next": route.next, "parallel_agents": route.parallel_agents}
+
+
+def dispatch(state):
+    """Next node for the supervisor's decision; several workers fan out in parallel.
+
+    Parallel workers see the same messages, append their replies to the
+    state, and the supervisor runs once more after all of them finished.
+    """
+    workers = [state["next"]] + [agent for agent in state.get("parallel_agents") or [] if agent != state["next"]]
+    if state["next"] in WORKERS and len(workers) > 1:
+        return [Send(agent, state) for agent in workers if agent in WORKERS]
+    return state["next"]
+
+
+async def output_summarizing_node(state):
+    """Process the state and generate a summary using the LLM.
+
+    Outputs of the current turn stored by reference are restored in full.
+    """
+    history = HISTORY.view(state["messages"], expand_current_turn=True)
     messages = [
         ("system", OUTPUT_SUMMARIZING_SYSTEM_PROMPT),
         (
             "assistant",
             "Please summarize the following information:\n\n"
-            + "\n".join([msg.content for msg in state["messages"]]),
+            + "\n".join([msg.content for msg in history]),
         ),
     ]
-    response = LLM.invoke(messages)
+    response = await LLM.ainvoke(messages)
+    PROMPT_TOKENS.record("Output_Summarizing_Agent", response, history)
     return {
         "messages": [
             AIMessage(content=response.content, name="Output_Summarizing_Agent")
@@ -179,8 +260,10 @@ def output_summarizing_node(state):
     }
 
 
+# The agents run to completion inside a node, so their intermediate steps are
+# not checkpointed; the node's reply is.
 financial_data_agent = create_react_agent(
-    LLM, tools=FINANCIAL_DATA_TOOLS, state_modifier=FINANCIAL_DATA_SYSTEM_PROMPT
+    LLM, tools=FINANCIAL_DATA_TOOLS, state_modifier=FINANCIAL_DATA_SYSTEM_PROMPT, checkpointer=False
 )
 
 financial_data_node = functools.partial(
@@ -190,7 +273,7 @@ financial_data_node = functools.partial(
 )
 
 web_research_agent = create_react_agent(
-    LLM, tools=WEB_RESEARCH_TOOLS, state_modifier=WEB_RESEARCH_SYSTEM_PROMPT
+    LLM, tools=WEB_RESEARCH_TOOLS, state_modifier=WEB_RESEARCH_SYSTEM_PROMPT, checkpointer=False
 )
 
 web_research_node = functools.partial(
@@ -217,9 +300,7 @@ def build_workflow() -> StateGraph:
         "Output_Summarizing_Agent": "Output_Summarizing_Agent",
         "FINISH": "Output_Summarizing_Agent",
     }
-    workflow.add_conditional_edges(
-        "Supervisor_Agent", lambda x: x["next"], conditional_map
-    )
+    workflow.add_conditional_edges("Supervisor_Agent", dispatch, conditional_map)
 
     workflow.add_edge("Output_Summarizing_Agent", END)
     workflow.add_edge(START, "Supervisor_Agent")
@@ -227,9 +308,11 @@ def build_workflow() -> StateGraph:
     return workflow
 
 
-def build_app():
-    """Build and compile the workflow."""
-    memory = MemorySaver()
+def build_app(checkpointer=None):
+    """Build and compile the workflow.
+
+    Uses the checkpointer configured by FIN_CHECKPOINT_PATH unless one is given.
+    """
     workflow = build_workflow()
 
-    return workflow.compile(checkpointer=memory)
+    return workflow.compile(checkpointer=checkpointer or get_checkpointer())
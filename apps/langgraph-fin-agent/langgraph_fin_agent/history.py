@@ -0,0 +1,189 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+# Rough size of a token for English text and JSON; exact counts come from the API usage.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_HISTORY_TOKENS = 4000
+DEFAULT_HISTORY_TURNS = 20
+DEFAULT_INLINE_TOKENS = 1000
+PREVIEW_CHARS = 1500
+REFERENCE_STORE_BYTES = 64 * 1024 * 1024
+REFERENCE_PATTERN = re.compile(r"\n\[\.\.\. full output stored as (ref:[0-9a-f]{16}), about \d+ tokens\]$")
+
+
+def estimate_tokens(text: Any) -> int:
+    return len(text if isinstance(text, str) else str(text)) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """Approximate prompt size of some messages."""
+    return sum(estimate_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+class ReferenceStore:
+    """Full text of large agent outputs, kept out of the conversation state.
+
+    Bounded by size; the least recently used outputs are dropped first, in
+    which case only their preview remains in the conversation.
+    """
+
+    def __init__(self, max_bytes: int = REFERENCE_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self._texts: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, text: str) -> str:
+        ref = "ref:" + hashlib.sha1(text.encode()).hexdigest()[:16]
+        with self._lock:
+            if ref in self._texts:
+                self._texts.move_to_end(ref)
+                return ref
+            self._texts[ref] = text
+            self._size += len(text)
+            while self._size > self.max_bytes and len(self._texts) > 1:
+                _, dropped = self._texts.popitem(last=False)
+                self._size -= len(dropped)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            text = self._texts.get(ref)
+            if text is not None:
+                self._texts.move_to_end(ref)
+            return text
+
+
+class HistoryPolicy:
+    """Keeps the conversation sent to the LLMs within a token budget.
+
+    Agent replies larger than `inline_tokens` are stored by reference: the
+    state keeps a preview and a `ref:` marker, and the full text is restored
+    only where it is needed, for the summary of the current turn. Prompts
+    see the current turn (the latest question and its replies) plus as many
+    earlier messages as fit in `history_tokens`, newest first, and the state
+    itself keeps only the last `max_turns` turns.
+    """
+
+    def __init__(
+        self,
+        history_tokens: int = DEFAULT_HISTORY_TOKENS,
+        max_turns: int = DEFAULT_HISTORY_TURNS,
+        inline_tokens: int = DEFAULT_INLINE_TOKENS,
+        store: Optional[ReferenceStore] = None,
+    ):
+        self.history_tokens = history_tokens
+        self.max_turns = max_turns
+        self.inline_tokens = inline_tokens
+        self.store = store or ReferenceStore()
+
+    @classmethod
+    def from_env(cls) -> "HistoryPolicy":
+        load_dotenv()
+        return cls(
+            history_tokens=int(os.getenv("FIN_HISTORY_TOKENS", str(DEFAULT_HISTORY_TOKENS))),
+            max_turns=int(os.getenv("FIN_HISTORY_TURNS", str(DEFAULT_HISTORY_TURNS))),
+            inline_tokens=int(os.getenv("FIN_INLINE_OUTPUT_TOKENS", str(DEFAULT_INLINE_TOKENS))),
+        )
+
+    def compact(self, content: Any) -> Any:
+        """Content to keep in the state for an agent reply."""
+        tokens = estimate_tokens(content)
+        if not isinstance(content, str) or tokens <= self.inline_tokens:
+            return content
+        ref = self.store.put(content)
+        return f"{content[:PREVIEW_CHARS]}\n[... full output stored as {ref}, about {tokens} tokens]"
+
+    def expand(self, content: Any) -> Any:
+        """Full text of a compacted reply, if it is still stored."""
+        match = REFERENCE_PATTERN.search(content) if isinstance(content, str) else None
+        if match is None:
+            return content
+        return self.store.get(match.group(1)) or content
+
+    def view(self, messages: Sequence[BaseMessage], expand_current_turn: bool = False) -> List[BaseMessage]:
+        """Messages to put in a prompt: the current turn and the earlier messages that fit the budget."""
+        current = _turn_starts(messages)[-1:] or [0]
+        earlier, turn = list(messages[: current[0]]), list(messages[current[0] :])
+        if expand_current_turn:
+            turn = [message.model_copy(update={"content": self.expand(message.content)}) for message in turn]
+
+        budget = self.history_tokens
+        kept: List[BaseMessage] = []
+        for message in reversed(earlier):
+            budget -= message_tokens([message])
+            if budget < 0:
+                break
+            kept.append(message)
+        omitted = len(earlier) - len(kept)
+        note = [SystemMessage(content=f"[{omitted} earlier messages omitted]")] if omitted else []
+        return note + kept[::-1] + turn
+
+    def trim(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """The last `max_turns` turns of a conversation."""
+        starts = _turn_starts(messages)
+        if len(starts) <= self.max_turns:
+            return list(messages)
+        return list(messages[starts[-self.max_turns] :])
+
+
+def _turn_starts(messages: Sequence[BaseMessage]) -> List[int]:
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+class PromptLog:
+    """Prompt tokens of each LLM call ("hop"), by graph node.
+
+    Uses the token counts reported by the API and falls back to the
+    estimate of the prompt when a response carries no usage.
+    """
+
+    def __init__(self, max_hops: int = 10000):
+        self.hops: "deque[tuple]" = deque(maxlen=max_hops)
+        self._recorded = 0
+        self._lock = threading.Lock()
+
+    def record(self, node: str, response: Any, prompt: Sequence[BaseMessage] = ()) -> int:
+        usage = getattr(response, "usage_metadata", None)
+        tokens = usage["input_tokens"] if usage else message_tokens(prompt)
+        with self._lock:
+            self.hops.append((node, tokens))
+            self._recorded += 1
+        return tokens
+
+    def record_agent_run(self, node: str, messages: Sequence[BaseMessage], first_new: int) -> None:
+        """Record the model calls of a ReAct agent run, i.e. its new AI messages."""
+        for i in range(first_new, len(messages)):
+            if isinstance(messages[i], AIMessage):
+                self.record(node, messages[i], messages[:i])
+
+    def mark(self) -> int:
+        with self._lock:
+            return self._recorded
+
+    def since(self, mark: int) -> List[tuple]:
+        """(node, tokens) of the hops recorded after `mark`."""
+        with self._lock:
+            count = min(self._recorded - mark, len(self.hops))
+            return list(self.hops)[len(self.hops) - count :]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """Number of hops, total, maximum and last prompt tokens per node."""
+        summary: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            hops = list(self.hops)
+        for node, tokens in hops:
+            stats = summary.setdefault(node, {"hops": 0, "total": 0, "max": 0, "last": 0})
+            stats["hops"] += 1
+            stats["total"] += tokens
+            stats["max"] = max(stats["max"], tokens)
+            stats["last"] = tokens
+        return summary
@@ -7,7 +7,11 @@ from langchain_core.messages import HumanMessage
 from relari_otel import Relari
 from relari_otel.specifications import Specifications
 
-from .graph import build_app
+from .cassette import cassette
+from .fmp import get_fmp_client
+from .graph import PRE_ROUTER, PROMPT_TOKENS, TOOL_POOL, build_app
+from .server import DEFAULT_HOST, DEFAULT_PORT, serve
+from .web import get_web_reader
 
 Relari.init(project_name="langgraph-fin-agent", batch=False)
 
@@ -26,13 +30,17 @@ async def main_interactive():
     while True:
         query = input("\nYour question: ").strip()
         if query.lower() == "exit":
+            print(f"Routing decisions: {dict(PRE_ROUTER.stats)}")
+            print(f"Prompt tokens per node: {PROMPT_TOKENS.summary()}")
             print("Thank you for using the Finance Assistant. Goodbye!")
             break
         inputs = {"messages": [HumanMessage(content=query)]}
+        mark = PROMPT_TOKENS.mark()
         with Relari.start_new_sample(scenario_id="interactive-query"):
             async for chunk in app.astream(inputs, config, stream_mode="values"):
                 chunk["messages"][-1].pretty_print()
             Relari.set_output(chunk["messages"][-1].content)
+        print("Prompt tokens per hop: " + ", ".join(f"{node} {tokens}" for node, tokens in PROMPT_TOKENS.since(mark)))
         print("=" * 80)
 
 
@@ -48,6 +56,29 @@ async def main_eval():
 
     specs = Specifications.load("specifications.json")
     await Relari.eval_runner(specs=specs, runnable=runnable)
+    print(f"Routing decisions: {dict(PRE_ROUTER.stats)}")
+    print(f"Prompt tokens per node: {PROMPT_TOKENS.summary()}")
+
+
+def session_stats() -> dict:
+    return {
+        "routing": dict(PRE_ROUTER.stats),
+        "prompt_tokens": PROMPT_TOKENS.summary(),
+        "tools": dict(TOOL_POOL.stats),
+        "fmp": get_fmp_client().metrics(),
+        "web": get_web_reader().metrics(),
+    }
+
+
+async def main_serve(host: str, port: int):
+    """Serve the assistant over HTTP, with one compiled graph shared by all conversations."""
+    app = build_app()
+    try:
+        await serve(app, host, port, stats=session_stats)
+    finally:
+        await get_fmp_client().aclose()
+        print(f"Routing decisions: {dict(PRE_ROUTER.stats)}")
+        print(f"Prompt tokens per node: {PROMPT_TOKENS.summary()}")
 
 
 def main():
@@ -58,16 +89,38 @@ def main():
         "--interactive", "-i", action="store_true", help="Run in interactive mode"
     )
     parser.add_argument("--eval", "-e", action="store_true", help="Run evaluation mode")
+    parser.add_argument("--serve", "-s", action="store_true", help="Serve the assistant over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to serve on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to serve on")
+    parser.add_argument(
+        "--record", metavar="CASSETTE", help="Record all FMP, web and model calls to a cassette file"
+    )
+    parser.add_argument(
+        "--replay", metavar="CASSETTE", help="Replay FMP, web and model calls from a cassette file"
+    )
 
     args = parser.parse_args()
 
-    if args.interactive and args.eval:
-        print("Error: Cannot specify both interactive and eval modes")
+    if args.record and args.replay:
+        print("Error: Cannot specify both --record and --replay")
+        sys.exit(1)
+    cassette_mode = "record" if args.record else "replay" if args.replay else None
+
+    if args.interactive + args.eval + args.serve > 1:
+        print("Error: Specify only one of interactive, eval and serve modes")
         sys.exit(1)
     elif args.interactive:
-        asyncio.run(main_interactive())
+        with cassette(cassette_mode, args.record or args.replay):
+            asyncio.run(main_interactive())
     elif args.eval:
-        asyncio.run(main_eval())
+        with cassette(cassette_mode, args.record or args.replay):
+            asyncio.run(main_eval())
+    elif args.serve:
+        with cassette(cassette_mode, args.record or args.replay):
+            try:
+                asyncio.run(main_serve(args.host, args.port))
+            except KeyboardInterrupt:
+                pass
     else:
         parser.print_help()
 
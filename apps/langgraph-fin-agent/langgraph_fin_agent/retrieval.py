@@ -0,0 +1,128 @@
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+PASSAGE_CHARS = 800
+DEFAULT_TOP_K = 8
+DEFAULT_MAX_TOKENS = 2000
+CHARS_PER_TOKEN = 4  # rough average for English text with OpenAI tokenizers
+
+# Numbers keep their separators so "25.2" or "1,234" match as a single term.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOP_WORDS = frozenset(
+    "a an and are as at be by did do does for from had has have how in is it its of on or "
+    "the that this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_CHARS) -> List[str]:
+    """Group consecutive lines into passages of about `max_chars` characters."""
+    passages, current, size = [], [], 0
+    for line in text.splitlines():
+        if current and size + len(line) > max_chars:
+            passages.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        passages.append("\n".join(current))
+    return passages
+
+
+class BM25:
+    """Okapi BM25 index over a list of passages, built in memory."""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(passage)) for passage in passages]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        n = len(passages)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+
+def top_passages(
+    text: str,
+    query: str,
+    top_k: int = DEFAULT_TOP_K,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+) -> str:
+    """Return the passages of `text` most relevant to `query`.
+
+    The text is split into passages and ranked with BM25; the best `top_k`
+    that fit in `max_tokens` are returned in document order, with "[...]"
+    marking the gaps between them. Falls back to the start of the text when
+    no passage shares a term with the query.
+    """
+    return search_passages([text], query, top_k, max_tokens)
+
+
+def search_passages(
+    windows: Iterable[str],
+    query: str,
+    top_k: int = DEFAULT_TOP_K,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+) -> str:
+    """`top_passages` over consecutive windows of one long text.
+
+    Each window is ranked on its own and only its best `top_k` passages are
+    kept, so memory is bounded by the window size rather than the text size.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    candidates: List[Tuple[float, int, str]] = []
+    beginning = None
+    count = 0
+    for text in windows:
+        if beginning is None:
+            beginning = text[:budget]
+        passages = split_passages(text)
+        scores = BM25(passages).scores(query)
+        candidates.extend((score, count + i, passages[i]) for i, score in enumerate(scores) if score > 0)
+        candidates = heapq.nlargest(top_k, candidates, key=lambda candidate: (candidate[0], -candidate[1]))
+        count += len(passages)
+    if not candidates:
+        return beginning or ""
+
+    selected: List[Tuple[int, str]] = []
+    used = 0
+    for _, i, passage in candidates:
+        if used + len(passage) > budget:
+            continue
+        selected.append((i, passage))
+        used += len(passage)
+    if not selected:
+        return candidates[0][2][:budget]
+
+    selected.sort()
+    parts, previous = [], -1
+    for i, passage in selected:
+        if i != previous + 1:
+            parts.append("[...]")
+        parts.append(passage)
+        previous = i
+    if previous != count - 1:
+        parts.append("[...]")
+    return "\n".join(parts)
@@ -0,0 +1,93 @@
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+FINANCIAL_AGENT = "Financial_Data_Agent"
+WEB_AGENT = "Web_Research_Agent"
+FINISH = "FINISH"
+
+URL_PATTERN = re.compile(r"https?://\S+|\bwww\.\S+", re.I)
+# Upper-case words that look like tickers, e.g. TSLA, $F or BRK.B, but not M&A.
+TICKER_PATTERN = re.compile(r"(?<![\w/.&])\$?([A-Z]{1,5}(?:\.[A-Z])?)(?![\w/&])")
+# Upper-case words that are not tickers: finance and business abbreviations,
+# exchanges, agencies and institutions, and common acronyms.
+NOT_TICKERS = frozenset(
+    "A I AI API CEO CFO CTO EBIT EBITDA EPS ETF EU FCF FY GAAP GDP IPO IR LLC MD OK PE ROA ROE "
+    "SEC TTM UK US USA USD YOY "
+    "AGM ARR CAGR CAPEX COGS COO CPI DCF ESG EV EVS FX IRR LBO NAV NPV OPEX PPI "
+    "Q QOQ REIT SAAS SMB YTD "
+    "AMEX CBOE CME LSE NYSE OTC TSE TSX "
+    "BOE CFTC CIA DOD DOJ ECB EPA FAA FBI FCC FDA FDIC FED FOMC FTC IMF IRS NASA NATO "
+    "OECD OPEC UN WHO WTO "
+    "AM AR ASAP CPU EST ET FAQ FYI GPU HR HTML IOT IT LLM ML NA OEM PC PDF PM PR PST "
+    "QA SUV TBD TV UTC VR".split()
+)
+FINANCIAL_TERMS = re.compile(
+    r"\b(stock|share|price|quote|market cap|capitali[sz]ation|revenue|sales|income|earnings|profit|"
+    r"margin|eps|ebitda|ratio|p/e|pe ratio|valuation|dividend|debt|equity|assets|liabilit|cash ?flow|"
+    r"balance sheet|financial|fundamental|beta|volume|screen|growth|return on)",
+    re.I,
+)
+
+
+class PreRouter:
+    """Deterministic routing rules tried before the LLM supervisor.
+
+    Looks at the current turn, i.e. the messages after the latest user
+    question. A question naming tickers or financial line items goes to the
+    financial data agent, one with URLs goes to the web research agent (which
+    can only read given pages); a question needing both gets both at once,
+    as they do not depend on each other. Once every agent the question calls
+    for has answered, the turn finishes. Anything else, including questions
+    the rules did not route and failed or empty agent replies, returns None
+    and is left to the LLM.
+
+    `stats` counts the decisions taken by each rule and the LLM fallbacks.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, int] = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def route(self, messages: Sequence[BaseMessage]) -> Optional[List[str]]:
+        """Agents to run next (several run in parallel), [FINISH], or None for the LLM."""
+        decision = self._decide(messages)
+        self.count(f"rule:{'+'.join(decision)}" if decision else "llm")
+        return decision
+
+    def _decide(self, messages: Sequence[BaseMessage]) -> Optional[List[str]]:
+        last_question = max((i for i, message in enumerate(messages) if isinstance(message, HumanMessage)), default=None)
+        if last_question is None:
+            return None
+        question = messages[last_question].content
+        if not isinstance(question, str):
+            return None
+        replies = messages[last_question + 1 :]
+        if any(not str(reply.content).strip() or str(reply.content).startswith("An error occurred") for reply in replies):
+            return None
+
+        # Only finish turns whose agents the rules chose; the LLM decides the rest.
+        needed = self.agents_for(question)
+        if not needed:
+            return None
+        answered = {reply.name for reply in replies}
+        pending = [agent for agent in needed if agent not in answered]
+        return pending or [FINISH]
+
+    @staticmethod
+    def agents_for(question: str) -> List[str]:
+        """Agents a question obviously needs."""
+        agents = []
+        tickers = [t for t in TICKER_PATTERN.findall(URL_PATTERN.sub(" ", question)) if t not in NOT_TICKERS]
+        if tickers or FINANCIAL_TERMS.search(question):
+            agents.append(FINANCIAL_AGENT)
+        if URL_PATTERN.search(question):
+            agents.append(WEB_AGENT)
+        return agents
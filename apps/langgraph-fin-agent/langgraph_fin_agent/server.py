@@ -0,0 +1,246 @@
+import asyncio
+import contextlib
+import json
+import os
+import uuid
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_MAX_QUEUE = 64
+MAX_BODY_BYTES = 64 * 1024
+HEADER_TIMEOUT = 30.0
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FinChatServer:
+    """Serves one compiled graph to many conversations over HTTP.
+
+    `POST /chat` takes `{"message": ..., "thread_id": ...}` and streams the
+    run as server-sent events: `queued` while waiting for a slot, `route` for
+    supervisor decisions, `message` for each agent reply and `done` with the
+    final answer (or `error`). Without a thread_id a new conversation is
+    started; its id is sent in the X-Thread-Id header and the `done` event.
+    `GET /health` and `GET /stats` report the load.
+
+    At most `max_concurrent` runs execute at once and up to `max_queue` more
+    wait in line; beyond that requests get 503. Requests for the same thread
+    run one after the other, as they extend the same conversation.
+    """
+
+    def __init__(
+        self,
+        app: Any,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        stats: Optional[Callable[[], Dict[str, Any]]] = None,
+    ):
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.stats: Dict[str, int] = Counter()
+        self._extra_stats = stats
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._active = 0
+        self._waiting = 0
+        self._threads: Dict[str, List] = {}
+
+    @classmethod
+    def from_env(cls, app: Any, stats: Optional[Callable[[], Dict[str, Any]]] = None) -> "FinChatServer":
+        load_dotenv()
+        return cls(
+            app,
+            max_concurrent=int(os.getenv("FIN_SERVER_MAX_CONCURRENT", str(DEFAULT_MAX_CONCURRENT))),
+            max_queue=int(os.getenv("FIN_SERVER_MAX_QUEUE", str(DEFAULT_MAX_QUEUE))),
+            stats=stats,
+        )
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self._handle, host, port)
+
+    def load(self) -> Dict[str, Any]:
+        return {"active": self._active, "queued": self._waiting, "threads": len(self._threads)}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await self._read_request(reader)
+            if path == "/health" and method == "GET":
+                await self._send_json(writer, 200, {"status": "ok", **self.load()})
+            elif path == "/stats" and method == "GET":
+                stats = {"requests": dict(self.stats), **self.load()}
+                if self._extra_stats is not None:
+                    stats.update(self._extra_stats())
+                await self._send_json(writer, 200, stats)
+            elif path == "/chat" and method == "POST":
+                await self._chat(writer, body)
+            elif path in ("/health", "/stats", "/chat"):
+                raise HTTPError(405, f"{method} is not allowed on {path}")
+            else:
+                raise HTTPError(404, f"Unknown path {path}")
+        except HTTPError as e:
+            self.stats["rejected" if e.status == 503 else "bad_requests"] += 1
+            headers = {"Retry-After": "1"} if e.status == 503 else {}
+            with contextlib.suppress(ConnectionError):
+                await self._send_json(writer, e.status, {"error": str(e)}, headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.stats["disconnected"] += 1
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HTTPError(408, "Timed out reading the request")
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in header_lines:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    async def _chat(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        message = payload.get("message") if isinstance(payload, dict) else None
+        if not isinstance(message, str) or not message.strip():
+            raise HTTPError(400, "Field 'message' must be a non-empty string")
+        thread_id = str(payload.get("thread_id") or uuid.uuid4())
+        if self._slots.locked() and self._waiting >= self.max_queue:
+            raise HTTPError(503, "Server busy, try again later")
+
+        self.stats["requests"] += 1
+        await self._send_head(writer, 200, {
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "Transfer-Encoding": "chunked",
+            "X-Thread-Id": thread_id,
+        })
+        try:
+            async with self._slot(thread_id, writer):
+                answer = await self._run(writer, message, thread_id)
+            await self._send_event(writer, "done", {"thread_id": thread_id, "answer": answer})
+            self.stats["completed"] += 1
+        except ConnectionError:
+            raise
+        except Exception as e:
+            self.stats["failed"] += 1
+            await self._send_event(writer, "error", {"thread_id": thread_id, "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @contextlib.asynccontextmanager
+    async def _slot(self, thread_id: str, writer: asyncio.StreamWriter) -> AsyncIterator[None]:
+        """Wait for the thread's previous request, then for a free run slot."""
+        entry = self._threads.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        self._waiting += 1
+        waiting = True
+        try:
+            if entry[0].locked() or self._slots.locked():
+                self.stats["queued"] += 1
+                await self._send_event(writer, "queued", {"position": self._waiting})
+            async with entry[0]:
+                async with self._slots:
+                    self._waiting -= 1
+                    waiting = False
+                    self._active += 1
+                    try:
+                        yield
+                    finally:
+                        self._active -= 1
+        finally:
+            if waiting:
+                self._waiting -= 1
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._threads[thread_id]
+
+    async def _run(self, writer: asyncio.StreamWriter, message: str, thread_id: str) -> Optional[str]:
+        inputs = {"messages": [HumanMessage(content=message)]}
+        config = {"configurable": {"thread_id": thread_id}}
+        answer = None
+        # Closing the stream when the client goes away cancels the run.
+        async with contextlib.aclosing(self.app.astream(inputs, config, stream_mode="updates")) as stream:
+            async for update in stream:
+                for node, values in update.items():
+                    values = values or {}
+                    if "next" in values:
+                        route = {"node": node, "next": values["next"], "parallel_agents": values.get("parallel_agents") or []}
+                        await self._send_event(writer, "route", route)
+                    for reply in values.get("messages") or []:
+                        answer = reply.content
+                        await self._send_event(writer, "message", {"node": node, "content": reply.content})
+        return answer
+
+    async def _send_head(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str]) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS[status]}"] + [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines + ["Connection: close", "", ""])).encode("latin-1"))
+        await writer.drain()
+
+    async def _send_json(
+        self, writer: asyncio.StreamWriter, status: int, payload: Any, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        await self._send_head(writer, status, {"Content-Type": "application/json", "Content-Length": str(len(body)), **(headers or {})})
+        writer.write(body)
+        await writer.drain()
+
+    async def _send_event(self, writer: asyncio.StreamWriter, event: str, data: Any) -> None:
+        chunk = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        writer.write(b"%X\r\n%s\r\n" % (len(chunk), chunk))
+        await writer.drain()
+
+
+async def serve(
+    app: Any, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, stats: Optional[Callable[[], Dict[str, Any]]] = None
+) -> None:
+    """Serve `app` until cancelled, with the limits from FIN_SERVER_MAX_CONCURRENT and FIN_SERVER_MAX_QUEUE."""
+    chat_server = FinChatServer.from_env(app, stats=stats)
+    server = await chat_server.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(
+        f"Serving on http://{address[0]}:{address[1]}"
+        f" (max {chat_server.max_concurrent} concurrent runs, {chat_server.max_queue} queued)"
+    )
+    async with server:
+        await server.serve_forever()
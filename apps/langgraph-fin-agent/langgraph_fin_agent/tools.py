@@ -1,128 +1,244 @@
-import json
-import time
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.tools import tool, StructuredTool
 
-import certifi
-from dotenv import load_dotenv
-import os
-from typing import List, Literal, Dict, Any, Optional
-import requests
-from bs4 import BeautifulSoup
+from typing import List, Literal, Dict, Any, Optional, Union
 
+from .analytics import METRICS, compare_metrics
+from .documents import get_document_library
+from .fmp import get_fmp_client
+from .formatting import OutputFormat, format_output
+from .warehouse import get_warehouse
+from .web import get_web_reader
+
+
+# Blocking work (page fetches and parsing, document reads, warehouse and
+# numpy analytics) runs here so that tools never block the event loop.
+BLOCKING_WORKERS = 16
+_blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="fin-tools")
+
+async def _run_blocking(fn, *args, **kwargs):
+    """Run a blocking function on the shared tool thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(_blocking_executor, functools.partial(fn, *args, **kwargs))
 
 def _fmp_request(endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
-    """Make a request to the FMP API with retry logic."""
-    load_dotenv()
-    try:
-        fmp_api_key = os.getenv('FMP_API_KEY')
-        base_url = "https://financialmodelingprep.com/api/v3"
-    except Exception as e:
-        print(f"No FMP_API_KEY found. You can get an API key at https://site.financialmodelingprep.com/: {e}")
-        return {"error": f"Error loading FMP API Key: {e}"}
-    
-    if params is None:
-        params = {}
-    params['apikey'] = fmp_api_key
-    url = f"{base_url}/{endpoint}?{urlencode(params)}"
-    
-    for attempt in range(max_retries):
-        try:
-            request = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urlopen(request, cafile=certifi.where())
-            data = response.read().decode("utf-8")
-
-            if not data:
-                print(f"Attempt {attempt + 1}: No data returned from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "No data returned from API"}
-            
-            results = json.loads(data)
-            if not results:
-                print(f"Attempt {attempt + 1}: Empty response from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "Empty response from API"}
-            
-            if isinstance(results, dict) and "Error Message" in results:
-                print(f"API Error: {results['Error Message']}")
-                return {"error": results["Error Message"]}
-            
-            return results
-        except HTTPError as e:
-            if e.code == 403:
-                print("HTTP Error 403: API access forbidden. Please check your API key.")
-                return {"error": "API access forbidden. Please check your API key."}
-            else:
-                print(f"HTTP Error {e.code}: {e.reason}")
-                return {"error": f"HTTP Error {e.code}: {e.reason}"}
-        except URLError as e:
-            print(f"URL Error: {e.reason}")
-            return {"error": f"URL Error: {e.reason}"}
-        except json.JSONDecodeError:
-            print("Invalid JSON response from API")
-            return {"error": "Invalid JSON response from API"}
-        except Exception as e:
-            print(f"An unexpected error occurred: {str(e)}")
-            return {"error": f"An unexpected error occurred: {str(e)}"}
-    
-    print(f"No valid data after {max_retries} attempts")
-    return {"error": f"No valid data after {max_retries} attempts"}
+    """Make a request to the FMP API through the shared pooled client."""
+    return get_fmp_client().request(endpoint, params, max_retries=max_retries)
+
+async def _afmp_request(endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
+    """Async `_fmp_request`, over the client's async connection pool."""
+    return await get_fmp_client().arequest(endpoint, params, max_retries=max_retries)
+
+def _fmp_periods(dataset: str, symbol: str, period: str, limit: Optional[int] = None) -> Any:
+    """Fetch a statement, ratio or key-metric series, reading the local warehouse first."""
+    warehouse = get_warehouse()
+    if warehouse is not None:
+        return warehouse.load(dataset, symbol, period)
+    params = {"period": period}
+    if limit:
+        params["limit"] = limit
+    return _fmp_request(f"{dataset}/{symbol}", params)
+
+async def _afmp_periods(dataset: str, symbol: str, period: str, limit: Optional[int] = None) -> Any:
+    """Async `_fmp_periods`; warehouse reads run on the tool thread pool."""
+    warehouse = get_warehouse()
+    if warehouse is not None:
+        return await _run_blocking(warehouse.load, dataset, symbol, period)
+    params = {"period": period}
+    if limit:
+        params["limit"] = limit
+    return await _afmp_request(f"{dataset}/{symbol}", params)
+
+MAX_BATCH_SYMBOLS = 50
+MAX_BATCH_WORKERS = 5
+
+PROFILE_SUMMARY_FIELDS = [
+    "companyName", "price", "mktCap", "beta", "currency", "exchangeShortName",
+    "sector", "industry", "country", "ceo", "fullTimeEmployees", "ipoDate",
+]
+
+def _normalize_symbols(symbols: List[str]) -> List[str]:
+    """Upper-case and de-duplicate symbols, keeping their order."""
+    seen = []
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen[:MAX_BATCH_SYMBOLS]
+
+async def _fmp_batch_request(endpoint: str, symbols: List[str]) -> Dict[str, Any]:
+    """Fetch a comma-separated symbol list in one request, keyed by symbol."""
+    data = await _afmp_request(f"{endpoint}/{','.join(symbols)}")
+    if "error" in data:
+        return {symbol: data for symbol in symbols}
+    return {item["symbol"]: item for item in data if "symbol" in item}
+
+async def _fmp_map_symbols(fn, symbols: List[str]) -> Dict[str, Any]:
+    """Run a per-symbol coroutine, at most MAX_BATCH_WORKERS at a time, keyed by symbol."""
+    semaphore = asyncio.Semaphore(MAX_BATCH_WORKERS)
+
+    async def run(symbol: str) -> Any:
+        async with semaphore:
+            return await fn(symbol)
+
+    return dict(zip(symbols, await asyncio.gather(*(run(symbol) for symbol in symbols))))
+
+PERIOD_ID_FIELDS = ["symbol", "date", "calendarYear", "period"]
+
+def _trim_periods(data: List[dict], fields: Optional[List[str]] = None, limit: Optional[int] = None) -> List[dict]:
+    """Keep only the most recent `limit` periods and the requested `fields` of each."""
+    if "error" in data:
+        return data
+    rows = data[:limit] if limit else data
+    if not fields:
+        return rows
+    wanted = PERIOD_ID_FIELDS + [f for f in fields if f not in PERIOD_ID_FIELDS]
+    trimmed = []
+    for row in rows:
+        keys = {k.lower(): k for k in row}
+        trimmed.append({keys[f.lower()]: row[keys[f.lower()]] for f in wanted if f.lower() in keys})
+    return trimmed
 
 @tool
-def generate_single_line_item_query(
+async def generate_single_line_item_query(
     ticker: str,
     statement: Literal["income-statement", "balance-sheet-statement", "cash-flow-statement"] = "income-statement",
     period: Literal["annual", "quarter"] = "annual",
-) -> List[dict]:
-    """Generate a single line item query for a given ticker."""
-    params = {"period": period}
-    result = _fmp_request(f"{statement}/{ticker}", params)
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Generate a single line item query for a given ticker.
+
+    Pass `fields` (e.g. ["netIncome"]) to return only those line items and `limit`
+    to return only the most recent periods. Use output_format="table" for a
+    compact CSV table instead of a list of dicts.
+    """
+    result = await _afmp_periods(statement, ticker, period, limit)
     if "error" in result:
         return [result]
-    return result
+    return format_output(_trim_periods(result, fields, limit), output_format)
 
 @tool
-def get_stock_price(symbol: str) -> dict:
+async def get_stock_price(symbol: str) -> dict:
     """Fetch the current stock price for a given symbol."""
-    data = _fmp_request(f"quote-short/{symbol}")
+    data = await _afmp_request(f"quote-short/{symbol}")
     if "error" in data:
         return data
     return {'price': data[0]['price']} if data else {"error": "No price data available"}
 
 @tool
-def get_company_profile(symbol: str) -> dict:
+async def get_company_profile(symbol: str) -> dict:
     """Fetch the company profile for a given symbol."""
-    data = _fmp_request(f"profile/{symbol}")
+    data = await _afmp_request(f"profile/{symbol}")
     if "error" in data:
         return data
     return data[0] if data else {"error": "No company profile data available"}
 
 @tool
-def get_financial_ratios(symbol: str, period: Literal["annual", "quarter"] = "annual") -> List[dict]:
-    """Fetch financial ratios for a given symbol."""
-    params = {"period": period}
-    return _fmp_request(f"ratios/{symbol}", params)
+async def get_financial_ratios(
+    symbol: str,
+    period: Literal["annual", "quarter"] = "annual",
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Fetch financial ratios for a given symbol.
+
+    Pass `fields` to return only those financial ratios and `limit` to return only the
+    most recent periods. Use output_format="table" for a compact CSV table
+    instead of a list of dicts.
+    """
+    result = await _afmp_periods("ratios", symbol, period, limit)
+    return format_output(_trim_periods(result, fields, limit), output_format)
 
 @tool
-def get_key_metrics(symbol: str, period: Literal["annual", "quarter"] = "annual") -> List[dict]:
-    """Fetch key metrics for a given symbol."""
-    params = {"period": period}
-    return _fmp_request(f"key-metrics/{symbol}", params)
+async def get_key_metrics(
+    symbol: str,
+    period: Literal["annual", "quarter"] = "annual",
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Fetch key metrics for a given symbol.
+
+    Pass `fields` to return only those key metrics and `limit` to return only the
+    most recent periods. Use output_format="table" for a compact CSV table
+    instead of a list of dicts.
+    """
+    result = await _afmp_periods("key-metrics", symbol, period, limit)
+    return format_output(_trim_periods(result, fields, limit), output_format)
 
 @tool
-def get_market_cap(symbol: str) -> dict:
+async def get_market_cap(symbol: str) -> dict:
     """Fetch the current market cap for a given symbol."""
-    data = _fmp_request(f"market-capitalization/{symbol}")
+    data = await _afmp_request(f"market-capitalization/{symbol}")
     return data[0] if data else {"error": "No market cap data available"}
 
 @tool
-def get_stock_screener(
+async def get_stock_prices(symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch the current stock prices for several symbols in a single call."""
+    symbols = _normalize_symbols(symbols)
+    quotes = await _fmp_batch_request("quote-short", symbols)
+    prices = {}
+    for symbol in symbols:
+        quote = quotes.get(symbol)
+        if quote is None:
+            prices[symbol] = {"error": "No price data available"}
+        elif "error" in quote:
+            prices[symbol] = quote
+        else:
+            prices[symbol] = {"price": quote["price"]}
+    return format_output(prices, output_format)
+
+@tool
+async def get_company_profiles(symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch a compact company profile for several symbols in a single call."""
+    symbols = _normalize_symbols(symbols)
+    profiles = await _fmp_batch_request("profile", symbols)
+    summaries = {}
+    for symbol in symbols:
+        profile = profiles.get(symbol)
+        if profile is None:
+            summaries[symbol] = {"error": "No company profile data available"}
+        elif "error" in profile:
+            summaries[symbol] = profile
+        else:
+            summaries[symbol] = {k: profile.get(k) for k in PROFILE_SUMMARY_FIELDS}
+    return format_output(summaries, output_format)
+
+@tool
+async def get_market_caps(symbols: List[str], output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch the current market cap for several symbols in a single call."""
+    async def market_cap(symbol: str) -> dict:
+        data = await _afmp_request(f"market-capitalization/{symbol}")
+        if "error" in data:
+            return data
+        return {"marketCap": data[0]["marketCap"], "date": data[0]["date"]} if data else {"error": "No market cap data available"}
+
+    return format_output(await _fmp_map_symbols(market_cap, _normalize_symbols(symbols)), output_format)
+
+@tool
+async def compare_companies(
+    symbols: List[str],
+    metrics: List[Literal[METRICS]],
+    period: Literal["annual", "quarter"] = "annual",
+    years: int = 5,
+    output_format: OutputFormat = "table",
+) -> Union[List[dict], str]:
+    """Compute and rank financial metrics across several companies in one call.
+
+    Returns one row per company with the latest value of each metric, its
+    average over the last `years` periods and its rank (1 = highest latest
+    value), e.g. to answer which company has the strongest operating margin
+    or the highest debt-to-equity ratio.
+    """
+    rows = await _run_blocking(compare_metrics, _normalize_symbols(symbols), metrics, _fmp_periods, period=period, years=years)
+    return format_output(rows, output_format)
+
+@tool
+async def get_stock_screener(
     market_cap_more_than: Optional[int] = None,
     market_cap_lower_than: Optional[int] = None,
     price_more_than: Optional[float] = None,
@@ -140,14 +256,15 @@ def get_stock_screener(
     industry: Optional[str] = None,
     country: Optional[str] = None,
     exchange: Optional[str] = None,
-    limit: int = 10
-) -> List[Dict[str, Any]]:
+    limit: int = 10,
+    output_format: OutputFormat = "json",
+) -> Union[List[Dict[str, Any]], str]:
     """Fetch stocks based on screening criteria."""
     # Convert camelCase to snake_case using a dictionary comprehension
     params = {
         k: str(v).lower() if isinstance(v, bool) else v
         for k, v in locals().items()
-        if v is not None and k != 'limit'
+        if v is not None and k not in ('limit', 'output_format')
     }
     
     # Convert snake_case to camelCase for API parameters
@@ -157,33 +274,55 @@ def get_stock_screener(
     }
     api_params['limit'] = limit
 
-    return _fmp_request("stock-screener", api_params)
+    return format_output(await _afmp_request("stock-screener", api_params), output_format)
 
 @tool
-def read_webpage(url: str) -> str:
-    """Read text content from a given webpage URL."""
-    try:
-        print(f"Agent visiting webpage: {url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+async def read_webpage(url: str, main_content: bool = False, query: Optional[str] = None) -> str:
+    """Read text content from a given webpage URL.
+
+    With main_content=True only the article body is returned, without
+    navigation, cookie banners, footers or related-article lists. Prefer it
+    for news articles, press releases and blog posts; use the default full
+    text for pages whose data sits in tables or lists.
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+    Pass the question being researched as query to get back only the most
+    relevant passages of the page (a few thousand tokens) instead of its
+    first 50,000 characters; this also finds figures deep inside long pages
+    such as filings or transcripts.
+    """
+    return await _run_blocking(get_web_reader().read, url, main_content=main_content, query=query)
 
-        for script in soup(["script", "style"]):
-            script.decompose()
+@tool
+async def read_webpages(
+    urls: List[str], timeout: float = 10, main_content: bool = False, query: Optional[str] = None
+) -> Dict[str, str]:
+    """Read text content from several webpage URLs concurrently.
 
-        text = soup.get_text(separator='\n', strip=True)
+    Returns the text of each page keyed by URL; pages that fail to load map to
+    an error message, so partial results are still returned. main_content
+    and query work as in read_webpage.
+    """
+    reader = get_web_reader()
+    urls = list(dict.fromkeys(urls))
+    semaphore = asyncio.Semaphore(reader.max_workers)
 
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+    async def read(url: str) -> str:
+        async with semaphore:
+            return await _run_blocking(reader.read, url, timeout, main_content, query)
 
-        return text[:50000]
+    return dict(zip(urls, await asyncio.gather(*(read(url) for url in urls))))
+
+@tool
+async def read_document(path: str, section: Optional[str] = None, query: Optional[str] = None) -> str:
+    """Read a local filing or report (e.g. a 10-K or 10-Q) from the documents directory.
 
-    except requests.RequestException as e:
-        return f"Error fetching the webpage: {str(e)}"
-    except Exception as e:
-        return f"Error processing the webpage: {str(e)}"
+    Without a section, returns the document's sections (e.g. "Item 7:
+    Management's Discussion and Analysis") with their sizes. With a section
+    ("Item 7", "7A", "Part II Item 1A", "Risk Factors" or "MD&A"), returns
+    that section's text. Add a query to get only the passages of the section
+    most relevant to the question, which is best for large sections such as
+    the financial statements; a query without a section searches the whole
+    document, e.g. a call transcript without Item headings. An unknown path
+    lists the available documents.
+    """
+    return await _run_blocking(get_document_library().read, path, section=section, query=query)
@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .fmp import DEFAULT_BASE_URL, get_fmp_client
+
+DATASETS = (
+    "income-statement",
+    "balance-sheet-statement",
+    "cash-flow-statement",
+    "ratios",
+    "key-metrics",
+)
+PERIODS = ("annual", "quarter")
+DAYS_PER_PERIOD = {"annual": 365, "quarter": 91}
+
+DEFAULT_WAREHOUSE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fin-agent", "warehouse.sqlite3")
+
+
+def default_warehouse_path() -> str:
+    """Warehouse file for the FMP base URL in use.
+
+    Other servers, such as the mock FMP API, get a file of their own so their
+    data never mixes with the real API's.
+    """
+    base_url = get_fmp_client().base_url
+    if base_url == DEFAULT_BASE_URL:
+        return DEFAULT_WAREHOUSE_PATH
+    digest = hashlib.sha1(base_url.encode()).hexdigest()[:12]
+    return os.path.join(os.path.dirname(DEFAULT_WAREHOUSE_PATH), f"warehouse-{digest}.sqlite3")
+
+
+class Warehouse:
+    """Local SQLite store of per-ticker financial time series.
+
+    Holds one row per (dataset, symbol, period, date), where dataset is one of
+    the FMP statement, ratio or key-metric endpoints. The first sync of a
+    series downloads its full history; later syncs only ask FMP for the
+    periods published since the most recent stored date. Series synced within
+    `refresh_seconds` are served without touching the network.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_WAREHOUSE_PATH,
+        refresh_seconds: int = 86400,
+        fetch: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+    ):
+        self.refresh_seconds = refresh_seconds
+        # Syncs skip the response cache, which would hide periods published within its TTL.
+        self._fetch = fetch or (lambda endpoint, params: get_fmp_client().request(endpoint, params, use_cache=False))
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS periods (
+                dataset TEXT, symbol TEXT, period TEXT, date TEXT, data TEXT,
+                PRIMARY KEY (dataset, symbol, period, date)
+            );
+            CREATE TABLE IF NOT EXISTS syncs (
+                dataset TEXT, symbol TEXT, period TEXT, synced REAL,
+                PRIMARY KEY (dataset, symbol, period)
+            );
+            """
+        )
+        self._db.commit()
+
+    def load(self, dataset: str, symbol: str, period: str = "annual") -> Any:
+        """Return stored periods (newest first), syncing first if the series is stale."""
+        symbol = symbol.upper()
+        with self._lock:
+            synced = self._db.execute(
+                "SELECT synced FROM syncs WHERE dataset = ? AND symbol = ? AND period = ?",
+                (dataset, symbol, period),
+            ).fetchone()
+        if synced is None or time.time() - synced[0] > self.refresh_seconds:
+            result = self.sync(dataset, symbol, period)
+            if "error" in result and synced is None:
+                return result
+        return self.rows(dataset, symbol, period)
+
+    def rows(self, dataset: str, symbol: str, period: str = "annual") -> List[dict]:
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT data FROM periods WHERE dataset = ? AND symbol = ? AND period = ? ORDER BY date DESC",
+                (dataset, symbol.upper(), period),
+            )
+            return [json.loads(data) for (data,) in cursor]
+
+    def sync(self, dataset: str, symbol: str, period: str = "annual") -> Dict[str, Any]:
+        """Fetch periods newer than the latest stored one and append them."""
+        symbol = symbol.upper()
+        with self._lock:
+            (latest,) = self._db.execute(
+                "SELECT MAX(date) FROM periods WHERE dataset = ? AND symbol = ? AND period = ?",
+                (dataset, symbol, period),
+            ).fetchone()
+
+        params = {"period": period}
+        if latest:
+            elapsed = (date.today() - date.fromisoformat(latest[:10])).days
+            params["limit"] = elapsed // DAYS_PER_PERIOD[period] + 1
+        data = self._fetch(f"{dataset}/{symbol}", params)
+        if isinstance(data, dict) and "error" in data:
+            return data
+
+        new_rows = [row for row in data if row.get("date") and (latest is None or row["date"] > latest)]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO periods (dataset, symbol, period, date, data) VALUES (?, ?, ?, ?, ?)",
+                [(dataset, symbol, period, row["date"], json.dumps(row)) for row in new_rows],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs (dataset, symbol, period, synced) VALUES (?, ?, ?, ?)",
+                (dataset, symbol, period, time.time()),
+            )
+            self._db.commit()
+        return {"dataset": dataset, "symbol": symbol, "period": period, "added": len(new_rows)}
+
+    def sync_many(self, symbols: List[str], datasets=DATASETS, periods=("annual",)) -> List[Dict[str, Any]]:
+        """Bulk-load several tickers, e.g. ahead of peak hours."""
+        return [
+            self.sync(dataset, symbol, period)
+            for symbol in symbols
+            for dataset in datasets
+            for period in periods
+        ]
+
+
+_warehouse: Optional[Warehouse] = None
+_warehouse_loaded = False
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse() -> Optional[Warehouse]:
+    """Return the process-wide warehouse, or None if disabled via FIN_WAREHOUSE_DISABLED."""
+    global _warehouse, _warehouse_loaded
+    if not _warehouse_loaded:
+        with _warehouse_lock:
+            if not _warehouse_loaded:
+                load_dotenv()
+                if os.getenv("FIN_WAREHOUSE_DISABLED", "").lower() not in ("1", "true", "yes"):
+                    _warehouse = Warehouse(
+                        path=os.getenv("FIN_WAREHOUSE_PATH") or default_warehouse_path(),
+                        refresh_seconds=int(os.getenv("FIN_WAREHOUSE_REFRESH_SECONDS", "86400")),
+                    )
+                _warehouse_loaded = True
+    return _warehouse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load the local financial statement warehouse")
+    parser.add_argument("symbols", nargs="+", help="Ticker symbols to sync")
+    parser.add_argument("--dataset", "-d", action="append", choices=DATASETS, help="Datasets to sync (default: all)")
+    parser.add_argument("--period", "-p", action="append", choices=PERIODS, help="Periods to sync (default: annual)")
+    args = parser.parse_args()
+
+    warehouse = get_warehouse() or Warehouse(path=default_warehouse_path())
+    for result in warehouse.sync_many(
+        args.symbols, datasets=args.dataset or DATASETS, periods=args.period or ("annual",)
+    ):
+        print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,569 @@
+import codecs
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .cache import DEFAULT_PAGE_CACHE_PATH, PageCache
+from .retrieval import top_passages
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+MAX_PAGE_CHARS = 50000
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "application/xml", "text/xml")
+TEXT_CONTENT_TYPES = ("text/plain",)
+# Tags whose contents BeautifulSoup leaves out of the page text.
+SKIPPED_TAGS = ("script", "style", "template")
+
+
+def extract_text(html: str) -> str:
+    """Extract readable text from an HTML document."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for script in soup(["script", "style"]):
+        script.decompose()
+
+    text = soup.get_text(separator='\n', strip=True)
+
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return '\n'.join(chunk for chunk in chunks if chunk)
+
+
+class TextCollector:
+    """Collects text nodes into phrases the same way `extract_text` splits them.
+
+    Parser backends report tags and text through `start`, `end` and `data`;
+    text is only split into phrases once a node is complete, since a node can
+    arrive split across several feeds.
+    """
+
+    def __init__(self):
+        self.phrases: List[str] = []
+        self.size = 0
+        self._pending: List[str] = []
+        self._skip = 0
+
+    def add_text(self, data: str) -> None:
+        for line in data.strip().splitlines():
+            for phrase in line.strip().split("  "):
+                phrase = phrase.strip()
+                if phrase:
+                    self.phrases.append(phrase)
+                    self.size += len(phrase) + 1
+
+    def flush(self) -> None:
+        if self._pending:
+            self.add_text("".join(self._pending))
+            self._pending = []
+
+    def start(self, tag: str, attrs=None) -> None:
+        self.flush()
+        if tag in SKIPPED_TAGS:
+            self._skip += 1
+
+    def end(self, tag: str) -> None:
+        self.flush()
+        if tag in SKIPPED_TAGS and self._skip:
+            self._skip -= 1
+
+    def data(self, data: str) -> None:
+        if not self._skip:
+            self._pending.append(data)
+
+    def text(self) -> str:
+        return "\n".join(self.phrases)
+
+
+class TextExtractor(TextCollector, HTMLParser):
+    """Incremental HTML-to-text extractor on the standard library parser.
+
+    Accepts the document in pieces through `feed` and produces the same text
+    as `extract_text`, so pages can be parsed while they download and the
+    download stopped once enough text has been collected.
+    """
+
+    def __init__(self):
+        TextCollector.__init__(self)
+        HTMLParser.__init__(self, convert_charrefs=True)
+
+    def handle_data(self, data):
+        self.data(data)
+
+    def handle_starttag(self, tag, attrs):
+        self.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.end(tag)
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+        if data.startswith("CDATA[") and not self._skip:
+            self.add_text(data[len("CDATA["):])
+
+    def close(self):
+        HTMLParser.close(self)
+        self.flush()
+
+
+class LxmlTextExtractor(TextCollector):
+    """Incremental extractor on libxml2's HTML parser, several times faster.
+
+    Requires the optional `lxml` package.
+    """
+
+    def __init__(self):
+        super().__init__()
+        from lxml import etree
+
+        self._errors = (etree.LxmlError,)
+        # The collector is wrapped because lxml would call its own `close`.
+        target = SimpleNamespace(
+            start=self.start,
+            end=self.end,
+            data=self.data,
+            comment=self._boundary,
+            pi=self._boundary,
+            close=lambda: None,
+        )
+        self._parser = etree.HTMLParser(target=target, no_network=True)
+
+    def _boundary(self, *args) -> None:
+        self.flush()
+
+    def feed(self, data: str) -> None:
+        if data:
+            self._parser.feed(data)
+
+    def close(self) -> None:
+        try:
+            self._parser.close()
+        except self._errors:
+            pass  # empty or unparseable document
+        self.flush()
+
+
+class SoupTextExtractor(TextCollector):
+    """Buffers the whole page and runs `extract_text`; kept as the reference backend."""
+
+    def feed(self, data: str) -> None:
+        self._pending.append(data)
+
+    def close(self) -> None:
+        text = extract_text("".join(self._pending))
+        self._pending = []
+        self.phrases = text.split("\n") if text else []
+        self.size = sum(len(phrase) + 1 for phrase in self.phrases)
+
+
+class PlainTextExtractor(TextCollector):
+    """Same interface as the HTML extractors for text/plain responses."""
+
+    def feed(self, data):
+        self._pending.append(data)
+        if "\n" in data:
+            buffered = "".join(self._pending)
+            complete, _, rest = buffered.rpartition("\n")
+            self.add_text(complete)
+            self._pending = [rest]
+
+    def close(self):
+        self.flush()
+
+
+# Readability-style weights: class/id hints and the base score of candidate blocks.
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|page|post|story|text|blog", re.I)
+NEGATIVE_HINTS = re.compile(
+    r"banner|breadcrumb|combx|comment|consent|cookie|disclaimer|footer|header|legal|menu|meta|modal|"
+    r"nav|newsletter|outbrain|popup|promo|related|share|shoutbox|sidebar|social|sponsor|subscribe|taboola|tags|widget",
+    re.I,
+)
+TAG_SCORES = {
+    "article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+    "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3, "form": -3,
+    "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5, "nav": -25, "aside": -25, "footer": -25,
+}
+PARAGRAPH_TAGS = {"p", "pre", "td", "blockquote"}
+BLOCK_TAGS = PARAGRAPH_TAGS | {
+    "article", "aside", "div", "dl", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "main", "nav", "ol", "section", "table", "ul",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# Tags a repeated start implicitly closes, e.g. <li>a<li>b, which html.parser does not repair.
+SELF_CLOSING_SIBLINGS = {"p", "li", "td", "th", "tr", "option", "dt", "dd"}
+MIN_PARAGRAPH_CHARS = 25
+MIN_CONTENT_CHARS = 250
+
+
+class _Block:
+    __slots__ = (
+        "tag", "parent", "children", "weight", "first", "last",
+        "chars", "link_chars", "commas", "score", "is_candidate", "has_blocks",
+    )
+
+    def __init__(self, tag: str, parent: Optional["_Block"], hints: str, first: int):
+        self.tag = tag
+        self.parent = parent
+        self.children: List["_Block"] = []
+        self.weight = TAG_SCORES.get(tag, 0)
+        if hints:
+            self.weight += 25 * bool(POSITIVE_HINTS.search(hints)) - 25 * bool(NEGATIVE_HINTS.search(hints))
+        self.first = self.last = first  # range of phrases inside the element
+        self.chars = self.link_chars = self.commas = 0
+        self.score = 0.0
+        self.is_candidate = False
+        self.has_blocks = False
+
+    @property
+    def link_density(self) -> float:
+        return self.link_chars / self.chars if self.chars else 0.0
+
+
+class MainContentCollector(TextCollector):
+    """Keeps only the main content of a page, readability style.
+
+    Builds a light element tree while the page is parsed, recording for each
+    element the span of phrases it contains and its text and link-text
+    lengths. Paragraph-like blocks score their parent and grandparent by
+    text length and comma count, each candidate's score is scaled by the
+    share of its text that is not link text, and class/id names such as
+    "article" or "footer" add or remove points. The best candidate and those
+    of its siblings that score close to it are returned; navigation, cookie
+    banners, footers and link lists mostly fall away. If nothing looks like an
+    article the full page text is returned.
+
+    Combined with a parser backend, see `MAIN_CONTENT_EXTRACTORS`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.root = _Block("#root", None, "", 0)
+        self._current = self.root
+        self._links = 0
+        self._main_text: Optional[str] = None
+
+    def add_text(self, data: str) -> None:
+        count = len(self.phrases)
+        super().add_text(data)
+        block = self._current
+        for phrase in self.phrases[count:]:
+            block.chars += len(phrase)
+            block.commas += phrase.count(",")
+            if self._links:
+                block.link_chars += len(phrase)
+
+    def start(self, tag: str, attrs=None) -> None:
+        super().start(tag, attrs)
+        if tag == "a":
+            self._links += 1
+        if tag in VOID_TAGS:
+            return
+        if tag in SELF_CLOSING_SIBLINGS and self._current.tag == tag:
+            self._close(self._current)
+        attrs = dict(attrs or ())
+        hints = f"{attrs.get('class') or ''} {attrs.get('id') or ''}".strip()
+        block = _Block(tag, self._current, hints, len(self.phrases))
+        if tag in BLOCK_TAGS:
+            self._current.has_blocks = True
+        self._current.children.append(block)
+        self._current = block
+
+    def end(self, tag: str) -> None:
+        super().end(tag)
+        if tag == "a" and self._links:
+            self._links -= 1
+        block = self._current
+        while block is not self.root and block.tag != tag:
+            block = block.parent
+        if block is not self.root:
+            while self._current is not block:
+                self._close(self._current)
+            self._close(block)
+
+    def _close(self, block: _Block) -> None:
+        block.last = len(self.phrases)
+        parent = block.parent
+        parent.chars += block.chars
+        parent.link_chars += block.link_chars
+        parent.commas += block.commas
+        self._current = parent
+
+    def _score(self) -> List[_Block]:
+        candidates = []
+        stack = [self.root]
+        while stack:
+            block = stack.pop()
+            stack.extend(block.children)
+            is_paragraph = block.tag in PARAGRAPH_TAGS or (block.tag == "div" and not block.has_blocks)
+            if not is_paragraph or block.chars < MIN_PARAGRAPH_CHARS:
+                continue
+            points = 1 + block.commas + min(block.chars // 100, 3)
+            for share, ancestor in ((1.0, block.parent), (0.5, block.parent and block.parent.parent)):
+                if ancestor is None or ancestor is self.root:
+                    break
+                if not ancestor.is_candidate:
+                    ancestor.is_candidate = True
+                    ancestor.score = ancestor.weight
+                    candidates.append(ancestor)
+                ancestor.score += points * share
+        for block in candidates:
+            block.score *= 1 - block.link_density
+        return candidates
+
+    def text(self) -> str:
+        if self._main_text is None:
+            self._main_text = self._main_content()
+        return self._main_text
+
+    def _main_content(self) -> str:
+        self.flush()
+        while self._current is not self.root:
+            self._close(self._current)
+        self.root.last = len(self.phrases)
+
+        candidates = self._score()
+        if not candidates:
+            return super().text()
+        top = max(candidates, key=lambda block: block.score)
+        if top.chars < MIN_CONTENT_CHARS and top.parent is not self.root:
+            top = top.parent  # a lone short candidate is usually part of a larger article
+
+        threshold = max(10, top.score * 0.2)
+        kept = []
+        for sibling in top.parent.children:
+            if sibling is top or sibling.score >= threshold or (
+                sibling.tag == "p" and sibling.chars > 80 and sibling.link_density < 0.25
+            ):
+                kept.append(sibling)
+        phrases = [phrase for block in kept for phrase in self.phrases[block.first:block.last]]
+        if sum(len(phrase) for phrase in phrases) < MIN_CONTENT_CHARS:
+            return super().text()
+        return "\n".join(phrases)
+
+
+class MainContentExtractor(MainContentCollector, TextExtractor):
+    pass
+
+
+class LxmlMainContentExtractor(MainContentCollector, LxmlTextExtractor):
+    pass
+
+
+EXTRACTORS = {
+    "html.parser": TextExtractor,
+    "lxml": LxmlTextExtractor,
+    "bs4": SoupTextExtractor,
+}
+
+
+# bs4 is only kept as a reference for the full-text output.
+MAIN_CONTENT_EXTRACTORS = {
+    "html.parser": MainContentExtractor,
+    "lxml": LxmlMainContentExtractor,
+    "bs4": MainContentExtractor,
+}
+
+
+def default_extractor() -> str:
+    """The fastest backend that is installed."""
+    try:
+        import lxml.etree  # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+class WebReader:
+    """Fetches web pages through keep-alive sessions pooled per host.
+
+    Sessions for the most recently used `max_hosts` hosts are kept open so
+    repeated visits to the same site skip the TCP and TLS handshakes.
+    `extractor` names the HTML parsing backend in `EXTRACTORS`. With a
+    `cache`, revisited pages are fetched with conditional requests and
+    served from the cache when the server answers 304 Not Modified.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        pool_size: int = 4,
+        max_hosts: int = 32,
+        max_workers: int = 5,
+        max_bytes: int = MAX_PAGE_BYTES,
+        extractor: Optional[str] = None,
+        cache: Optional[PageCache] = None,
+    ):
+        extractor = extractor or default_extractor()
+        if extractor not in EXTRACTORS:
+            raise ValueError(f"Unknown extractor {extractor!r}, expected one of {tuple(EXTRACTORS)}")
+        self.extractor = extractor
+        self.cache = cache
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.max_hosts = max_hosts
+        self.max_workers = max_workers
+        self._sessions: "OrderedDict[str, requests.Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def session_for(self, url: str) -> requests.Session:
+        host = urlparse(url).netloc
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({'User-Agent': USER_AGENT})
+                self._sessions[host] = session
+                while len(self._sessions) > self.max_hosts:
+                    _, evicted = self._sessions.popitem(last=False)
+                    evicted.close()
+            else:
+                self._sessions.move_to_end(host)
+            return session
+
+    def read(
+        self,
+        url: str,
+        timeout: Optional[float] = None,
+        main_content: bool = False,
+        query: Optional[str] = None,
+    ) -> str:
+        """Read text content from a web page, returning an error message on failure.
+
+        The body is streamed and parsed as it arrives. Downloading stops after
+        `max_bytes` or once enough text has been extracted, and non-HTML
+        responses are rejected from their headers alone. With `main_content`
+        only the article body is returned, see `MainContentCollector`. With a
+        `query` the whole page (up to `max_bytes`) is read and only the
+        passages most relevant to it are returned, see `top_passages`.
+        """
+        try:
+            print(f"Agent visiting webpage: {url}")
+            # Text is cached per extraction mode; query reads need the whole page.
+            key = f"{'main' if main_content else 'text'}{'+all' if query else ''} {url}"
+            cached = self.cache.lookup(key) if self.cache is not None else None
+            headers = {}
+            if cached is not None:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+
+            session = self.session_for(url)
+            with session.get(url, headers=headers, timeout=timeout or self.timeout, stream=True) as response:
+                if cached is not None and response.status_code == 304:
+                    self.cache.revalidated(key)
+                    text = cached[2]
+                else:
+                    response.raise_for_status()
+                    text = self._extract(response, main_content, whole_page=bool(query))
+                    self._store(key, response, text)
+            if query:
+                return top_passages(text, query)
+            return text[:MAX_PAGE_CHARS]
+        except requests.RequestException as e:
+            return f"Error fetching the webpage: {str(e)}"
+        except Exception as e:
+            return f"Error processing the webpage: {str(e)}"
+
+    def _extract(self, response: requests.Response, main_content: bool, whole_page: bool) -> str:
+        header = response.headers.get("Content-Type", "text/html")
+        content_type = header.split(";")[0].strip().lower()
+        if content_type not in HTML_CONTENT_TYPES + TEXT_CONTENT_TYPES:
+            raise ValueError(f"unsupported content type {content_type}")
+
+        encoding = response.encoding if "charset" in header.lower() else "utf-8"
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        if content_type in TEXT_CONTENT_TYPES:
+            extractor = PlainTextExtractor()
+        elif main_content:
+            extractor = MAIN_CONTENT_EXTRACTORS[self.extractor]()
+        else:
+            extractor = EXTRACTORS[self.extractor]()
+
+        received = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            chunk = chunk[: self.max_bytes - received]
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if received >= self.max_bytes or (not whole_page and extractor.size >= MAX_PAGE_CHARS):
+                break
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        return extractor.text()
+
+    def _store(self, key: str, response: requests.Response, text: str) -> None:
+        """Cache pages that can be revalidated, i.e. sent with an ETag or Last-Modified."""
+        if self.cache is None or "no-store" in response.headers.get("Cache-Control", "").lower():
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self.cache.store(key, text, etag, last_modified)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of the page cache counters."""
+        if self.cache is None:
+            return {"page_cache": None}
+        return {"page_cache": {**self.cache.stats, "bytes": self.cache.size}}
+
+    def read_many(
+        self,
+        urls: List[str],
+        timeout: Optional[float] = None,
+        main_content: bool = False,
+        query: Optional[str] = None,
+    ) -> Dict[str, str]:
+        """Read several pages concurrently; failed pages map to an error message."""
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls) or 1)) as executor:
+            return dict(zip(urls, executor.map(lambda url: self.read(url, timeout, main_content, query), urls)))
+
+
+_reader: Optional[WebReader] = None
+_reader_lock = threading.Lock()
+
+
+def get_web_reader() -> WebReader:
+    """Return the process-wide web reader, creating it on first use."""
+    global _reader
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                load_dotenv()
+                cache = None
+                if os.getenv("FIN_WEB_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"):
+                    cache = PageCache(
+                        path=os.getenv("FIN_WEB_CACHE_PATH") or DEFAULT_PAGE_CACHE_PATH,
+                        max_bytes=int(float(os.getenv("FIN_WEB_CACHE_MAX_MB", "100")) * 1024 * 1024),
+                    )
+                _reader = WebReader(extractor=os.getenv("FIN_WEB_EXTRACTOR"), cache=cache)
+    return _reader
@@ -7,7 +7,12 @@ from tools import (
     get_market_cap,
     get_stock_screener,
     generate_single_line_item_query,
-    read_webpage
+    get_stock_prices,
+    get_company_profiles,
+    get_market_caps,
+    read_webpage,
+    read_webpages,
+    read_document
 )
 
 def transfer_to_summarizer():
@@ -36,6 +41,9 @@ financial_data_agent = Agent(
     3. Do not add commentary or explanations
     4. Focus on gathering accurate and up-to-date information
     5. Once you have gathered the relevant financial data, you can transfer the task back to the Supervisor Agent for further processing.
+    6. When the query involves several companies, use the multi-symbol tools (get_stock_prices, get_company_profiles, get_market_caps) to fetch them in one call.
+    7. Use the `fields` and `limit` arguments to request only the line items and periods needed for the query.
+    8. Prefer output_format="table" for multi-period or multi-company data to keep responses compact.
     
     Always provide unprocessed data as your response.""",
     functions=[
@@ -46,6 +54,9 @@ financial_data_agent = Agent(
         get_market_cap,
         get_stock_screener,
         generate_single_line_item_query,
+        get_stock_prices,
+        get_company_profiles,
+        get_market_caps,
         transfer_to_supervisor,
     ]
 )
@@ -61,9 +72,15 @@ web_researcher_agent = Agent(
     3. Do not add commentary or explanations
     4. Focus on gathering accurate and up-to-date information
     5. Once you have gathered the relevant information, you can transfer the task back to the Supervisor Agent for further processing.
+    6. When several pages are relevant, read them together with read_webpages instead of one at a time.
+    7. For news articles, press releases and blog posts, set main_content to read only the article body.
+    8. For long pages such as filings, transcripts or reports, pass the user's question as query to get only the relevant passages.
+    9. For local filings, call read_document without a section to list its sections, then read only the sections you need.
     """,
     functions=[
         read_webpage,
+        read_webpages,
+        read_document,
         transfer_to_supervisor,
     ]
 )
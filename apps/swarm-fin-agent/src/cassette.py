@@ -0,0 +1,63 @@
+import contextlib
+import os
+from typing import Iterator, Optional
+
+MODES = ("off", "record", "replay")
+DEFAULT_CASSETTE_PATH = os.path.join("cassettes", "session.yaml")
+
+# Telemetry endpoints are passed through rather than recorded.
+DEFAULT_IGNORE_HOSTS = (
+    "telemetry.crewai.com",
+    "api.smith.langchain.com",
+)
+
+
+def _ignored_hosts() -> list:
+    extra = os.getenv("FIN_CASSETTE_IGNORE_HOSTS", "")
+    return list(DEFAULT_IGNORE_HOSTS) + [host.strip() for host in extra.split(",") if host.strip()]
+
+
+@contextlib.contextmanager
+def cassette(mode: Optional[str] = None, path: Optional[str] = None) -> Iterator[None]:
+    """Record or replay every outbound HTTP call made inside the block.
+
+    Covers FMP requests, web page fetches and chat-model calls, whichever
+    HTTP library the framework uses. `mode` and `path` default to
+    FIN_CASSETTE_MODE and FIN_CASSETTE_PATH. In "record" mode the cassette is
+    rewritten from scratch; in "replay" mode nothing reaches the network and
+    an unrecorded request raises an error. The FMP response cache, web page
+    cache and local warehouse are bypassed in both modes so recordings replay
+    identically.
+    """
+    mode = mode or os.getenv("FIN_CASSETTE_MODE", "off")
+    path = path or os.getenv("FIN_CASSETTE_PATH", DEFAULT_CASSETTE_PATH)
+    if mode not in MODES:
+        raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+    if mode == "off":
+        yield
+        return
+
+    import vcr
+
+    os.environ["FMP_CACHE_DISABLED"] = "1"
+    os.environ["FIN_WAREHOUSE_DISABLED"] = "1"
+    os.environ["FIN_WEB_CACHE_DISABLED"] = "1"
+    if mode == "replay":
+        # Clients refuse to start without keys; replayed calls never use them.
+        os.environ.setdefault("FMP_API_KEY", "replay")
+        os.environ.setdefault("OPENAI_API_KEY", "sk-replay")
+    elif os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    recorder = vcr.VCR(
+        record_mode="all" if mode == "record" else "none",
+        match_on=("method", "scheme", "host", "port", "path", "query", "body"),
+        filter_headers=("authorization", "api-key", "x-api-key", "cookie"),
+        filter_query_parameters=("apikey",),
+        ignore_hosts=_ignored_hosts(),
+        decode_compressed_response=True,
+    )
+    print(f"Cassette {mode}: {path}")
+    with recorder.use_cassette(path, allow_playback_repeats=True):
+        yield
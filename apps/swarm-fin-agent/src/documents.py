@@ -0,0 +1,251 @@
+import codecs
+import hashlib
+import html
+import json
+import mmap
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from retrieval import search_passages
+from web import CHUNK_SIZE, EXTRACTORS, MAX_PAGE_CHARS, PlainTextExtractor, default_extractor
+
+DEFAULT_DOCUMENTS_DIR = "documents"
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "fin-agent", "documents")
+INDEX_VERSION = 1
+SNIFF_BYTES = 64 * 1024
+TITLE_BYTES = 600
+# Queries rank the text a window at a time, so memory stays flat for any file size.
+SEARCH_WINDOW_CHARS = 1024 * 1024
+
+_SPACE = rb"(?:\s|&nbsp;|&#160;|&#xa0;|\xc2\xa0)"
+# "PART II" and "Item 7A." headings at the start of a line or right after a tag.
+HEADING_PATTERN = re.compile(
+    rb"(?:^|[\n>])" + _SPACE + rb"*(?:"
+    rb"part" + _SPACE + rb"+(?P<part>iv|iii|ii|i)(?![a-z])|"
+    rb"(?P<label>item" + _SPACE + rb"+(?P<item>\d{1,2}[a-c]?))(?![0-9a-z]))",
+    re.I,
+)
+BLOCK_END_PATTERN = re.compile(rb"</(?:div|p|td|th|tr|li|h[1-6]|title)\s*>|<br\s*/?>|<(?:div|p|tr|table)[\s>]", re.I)
+TAG_PATTERN = re.compile(rb"<[^>]*>?")
+# Item 7 of a 10-K, Part I Item 2 of a 10-Q; "management" alone also matches Item 12.
+ALIASES = {"md&a": "discussion and analysis", "mda": "discussion and analysis"}
+
+
+def _title(document: mmap.mmap, offset: int) -> str:
+    """Heading text following an item label, e.g. "Risk Factors"."""
+    raw = BLOCK_END_PATTERN.sub(b"\n", document[offset : offset + TITLE_BYTES])
+    text = html.unescape(TAG_PATTERN.sub(b" ", raw).decode("utf-8", errors="replace"))
+    for line in text.splitlines():
+        line = " ".join(line.split()).strip(".:-–— ")
+        if line:
+            return line[:100]
+    return ""
+
+
+def build_index(document: mmap.mmap) -> List[Dict[str, Any]]:
+    """Find the byte span of every item of a 10-K/10-Q style filing.
+
+    Item labels also appear in the table of contents and in cross references;
+    for each item the occurrence followed by the most text before the next
+    heading is taken as the real section. Items numbered again in another
+    part, as in 10-Qs, are kept per part.
+    """
+    headings = []
+    part = None
+    for match in HEADING_PATTERN.finditer(document):
+        if match.group("part"):
+            part = match.group("part").decode().upper()
+        else:
+            headings.append((match.start("label"), part, match.group("item").decode().upper(), match.end("item")))
+
+    occurrences: Dict[str, Dict[Optional[str], tuple]] = {}
+    for i, (start, part, item, label_end) in enumerate(headings):
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(document)
+        by_part = occurrences.setdefault(item, {})
+        if end - start > by_part.get(part, (0,))[0]:
+            by_part[part] = (end - start, start, part, item, label_end)
+
+    chosen = []
+    for by_part in occurrences.values():
+        if len([part for part in by_part if part]) > 1:
+            chosen.extend(occurrence for part, occurrence in by_part.items() if part)
+        else:
+            chosen.append(max(by_part.values()))
+    chosen = sorted(occurrence[1:] for occurrence in chosen)
+    repeated = len({item for _, _, item, _ in chosen}) < len(chosen)
+    sections = []
+    for i, (start, part, item, label_end) in enumerate(chosen):
+        sections.append({
+            "id": f"Part {part} Item {item}" if repeated and part else f"Item {item}",
+            "title": _title(document, label_end),
+            "start": start,
+            "end": chosen[i + 1][0] if i + 1 < len(chosen) else len(document),
+        })
+    return sections
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9&]", "", text.lower())
+
+
+def find_sections(sections: List[Dict[str, Any]], name: str) -> List[Dict[str, Any]]:
+    """Match "Item 7", "7A", "Part II Item 1A", "Risk Factors" or "MD&A" to sections."""
+    wanted = _normalize(name)
+    if re.fullmatch(r"\d{1,2}[a-c]?", wanted):
+        wanted = "item" + wanted
+    exact = [section for section in sections if _normalize(section["id"]) == wanted]
+    if exact:
+        return exact
+    # Ids only carry the part when item numbers repeat, so "Part II Item 7" can name a plain "Item 7".
+    qualified = re.fullmatch(r"part(?:iv|iii|ii|i)(item\d{1,2}[a-c]?)", wanted)
+    if qualified:
+        return [section for section in sections if _normalize(section["id"]) == qualified.group(1)]
+    by_item = [section for section in sections if _normalize(section["id"]).endswith(wanted) and "item" in wanted]
+    if by_item:
+        return by_item
+    wanted = _normalize(ALIASES.get(name.strip().lower(), name))
+    return [section for section in sections if wanted and wanted in _normalize(section["title"])]
+
+
+class DocumentLibrary:
+    """Reads large local filings without loading them into memory.
+
+    Files under `root` are memory-mapped. The byte offsets of their item
+    sections are found once per file version and saved under `index_dir`, so
+    later reads only touch the pages of the requested section, which is
+    decoded and converted to text in chunks.
+    """
+
+    def __init__(self, root: str = DEFAULT_DOCUMENTS_DIR, index_dir: str = DEFAULT_INDEX_DIR):
+        self.root = os.path.abspath(root)
+        self.index_dir = index_dir
+        self._indexes: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, path: str) -> str:
+        """Absolute path of a document, which must live under `root`."""
+        full_path = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([full_path, os.path.realpath(self.root)]) != os.path.realpath(self.root):
+            raise ValueError(f"{path} is outside the documents directory")
+        if not os.path.isfile(full_path):
+            raise FileNotFoundError(f"Document {path} not found. Available documents: {', '.join(self.list()) or 'none'}")
+        return full_path
+
+    def list(self) -> List[str]:
+        documents = []
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                documents.append(os.path.relpath(os.path.join(directory, name), self.root))
+        return sorted(documents)
+
+    def sections(self, full_path: str, document: mmap.mmap) -> List[Dict[str, Any]]:
+        stat = os.stat(full_path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._indexes.get(full_path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        index_path = os.path.join(self.index_dir, hashlib.sha1(full_path.encode()).hexdigest() + ".json")
+        sections = None
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                saved = json.load(f)
+            if saved.get("version") == INDEX_VERSION and tuple(saved.get("file", ())) == version:
+                sections = saved["sections"]
+        if sections is None:
+            sections = build_index(document)
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(index_path, "w") as f:
+                json.dump({"version": INDEX_VERSION, "file": list(version), "sections": sections}, f)
+        with self._lock:
+            self._indexes[full_path] = (version, sections)
+        return sections
+
+    def read(self, path: str, section: Optional[str] = None, query: Optional[str] = None) -> str:
+        """Return a document's table of sections, or the text of one section.
+
+        With a `query` the whole section, or the whole document if no section
+        is given, is searched a window at a time and only the passages most
+        relevant to the query are returned. Errors are returned as messages.
+        """
+        try:
+            full_path = self.resolve(path)
+            if os.path.getsize(full_path) == 0:
+                return f"Error reading the document: {path} is empty"
+            with open(full_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as document:
+                sections = self.sections(full_path, document)
+                if section is None and query:
+                    return search_passages(self._windows(document, 0, len(document)), query)
+                if section is None:
+                    return self._contents(path, sections)
+
+                matches = find_sections(sections, section)
+                if not matches:
+                    return f"Error reading the document: no section matches {section!r}.\n" + self._contents(path, sections)
+                if len(matches) > 1:
+                    names = ", ".join(f"{match['id']} ({match['title']})" for match in matches)
+                    return f"Error reading the document: {section!r} is ambiguous, choose one of: {names}"
+
+                match = matches[0]
+                heading = f"{match['id']}. {match['title']}\n"
+                if query:
+                    return heading + search_passages(self._windows(document, match["start"], match["end"]), query)
+                text = self._text(document, match["start"], match["end"])
+                if len(text) > MAX_PAGE_CHARS:
+                    return heading + text[:MAX_PAGE_CHARS] + "\n[... section truncated, pass a query to find specific passages]"
+                return heading + text
+        except (OSError, ValueError) as e:
+            return f"Error reading the document: {str(e)}"
+
+    def _contents(self, path: str, sections: List[Dict[str, Any]]) -> str:
+        if not sections:
+            return f"{path} has no Item headings; read it with a query to search the whole document."
+        lines = [f"Sections of {path}:"]
+        lines.extend(
+            f"{section['id']}: {section['title']} ({(section['end'] - section['start']) // 1024} KB)"
+            for section in sections
+        )
+        return "\n".join(lines)
+
+    def _text(self, document: mmap.mmap, start: int, end: int) -> str:
+        """Extract the text of a byte range, stopping once a page's worth is read."""
+        return next(self._windows(document, start, end, MAX_PAGE_CHARS), "")
+
+    def _windows(self, document: mmap.mmap, start: int, end: int, window_chars: int = SEARCH_WINDOW_CHARS):
+        """Extract the text of a byte range as consecutive windows of about `window_chars`."""
+        sniff = document[:SNIFF_BYTES].lower()
+        is_html = any(marker in sniff for marker in (b"<html", b"<body", b"<div", b"<p>", b"<table"))
+        extractor = EXTRACTORS[default_extractor()]() if is_html else PlainTextExtractor()
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        for offset in range(start, end, CHUNK_SIZE):
+            extractor.feed(decoder.decode(document[offset : min(offset + CHUNK_SIZE, end)]))
+            if extractor.size > window_chars:
+                yield extractor.text()
+                extractor.phrases, extractor.size = [], 0
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        if extractor.phrases:
+            yield extractor.text()
+
+
+_library: Optional[DocumentLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_document_library() -> DocumentLibrary:
+    """Return the process-wide document library, rooted at FIN_DOCUMENTS_DIR."""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                load_dotenv()
+                _library = DocumentLibrary(
+                    root=os.getenv("FIN_DOCUMENTS_DIR", DEFAULT_DOCUMENTS_DIR),
+                    index_dir=os.getenv("FIN_DOCUMENTS_INDEX_DIR", DEFAULT_INDEX_DIR),
+                )
+    return _library
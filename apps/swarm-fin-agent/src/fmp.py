@@ -0,0 +1,310 @@
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import certifi
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from cache import DEFAULT_CACHE_PATH, TTLCache, cache_key
+
+DEFAULT_BASE_URL = "https://financialmodelingprep.com/api/v3"
+
+# Transient statuses worth retrying instead of surfacing to the agent.
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting the request rate to the FMP API.
+
+    `acquire` blocks until a token is available; the time spent queueing is
+    recorded in `stats`.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.stats = {"acquired": 0, "queued": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def acquire(self) -> float:
+        """Take one token, waiting if necessary. Returns the seconds waited."""
+        start = time.monotonic()
+        queued = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    waited = now - start if queued else 0.0
+                    self.stats["acquired"] += 1
+                    if queued:
+                        self.stats["queued"] += 1
+                        self.stats["total_wait_seconds"] += waited
+                        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            queued = True
+            time.sleep(delay)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing a key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and receive the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class FMPClient:
+    """Long-lived client for the FMP API.
+
+    Holds a single `requests.Session` so that every tool call reuses pooled
+    keep-alive connections instead of paying a fresh TLS handshake.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = DEFAULT_BASE_URL,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        cache: Optional[TTLCache] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        backoff_base: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        self.api_key = api_key
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self.retries = 0
+        self.inflight = SingleFlight()
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "Mozilla/5.0"})
+        self.session.verify = certifi.where()
+
+    @classmethod
+    def from_env(cls) -> "FMPClient":
+        """Build a client from environment variables (and `.env`), read once."""
+        load_dotenv()
+        cache = None
+        if os.getenv("FMP_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"):
+            cache = TTLCache(
+                path=os.getenv("FMP_CACHE_PATH", DEFAULT_CACHE_PATH) or None,
+                max_memory_entries=int(os.getenv("FMP_CACHE_MEMORY_ENTRIES", "512")),
+                max_disk_entries=int(os.getenv("FMP_CACHE_DISK_ENTRIES", "10000")),
+            )
+        # Requests per minute allowed by the FMP plan; 0 disables limiting.
+        rate_per_minute = float(os.getenv("FMP_RATE_LIMIT", "300"))
+        rate_limiter = None
+        if rate_per_minute > 0:
+            rate_limiter = TokenBucket(
+                rate=rate_per_minute / 60,
+                capacity=int(os.getenv("FMP_RATE_BURST", "10")),
+            )
+        return cls(
+            api_key=os.getenv("FMP_API_KEY"),
+            base_url=os.getenv("FMP_BASE_URL", DEFAULT_BASE_URL),
+            pool_size=int(os.getenv("FMP_POOL_SIZE", "10")),
+            connect_timeout=float(os.getenv("FMP_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("FMP_READ_TIMEOUT", "30")),
+            cache=cache,
+            rate_limiter=rate_limiter,
+            max_backoff=float(os.getenv("FMP_MAX_BACKOFF", "30")),
+        )
+
+    def request(self, endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
+        """Make a request to the FMP API, serving fresh results from the cache.
+
+        Identical requests issued concurrently share a single HTTP call.
+        """
+        key = cache_key(endpoint, params, self.base_url)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        return self.inflight.do(key, lambda: self._fetch_and_store(key, endpoint, params, max_retries))
+
+    def _fetch_and_store(self, key: str, endpoint: str, params: Dict[str, Any], max_retries: int) -> Dict[str, Any]:
+        results = self._fetch(endpoint, params, max_retries)
+        if self.cache is not None and not (isinstance(results, dict) and "error" in results):
+            self.cache.set(key, results, self.cache.ttl_for(endpoint))
+        return results
+
+    def _fetch(self, endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
+        """Make a request to the FMP API with retry logic."""
+        if not self.api_key:
+            print("No FMP_API_KEY found. You can get an API key at https://site.financialmodelingprep.com/")
+            return {"error": "Error loading FMP API Key: FMP_API_KEY is not set"}
+
+        query = dict(params or {})
+        query["apikey"] = self.api_key
+        url = f"{self.base_url}/{endpoint}"
+
+        for attempt in range(max_retries):
+            last_attempt = attempt == max_retries - 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=query, timeout=self.timeout)
+                if response.status_code == 403:
+                    print("HTTP Error 403: API access forbidden. Please check your API key.")
+                    return {"error": "API access forbidden. Please check your API key."}
+                if response.status_code in RETRY_STATUS_CODES and not last_attempt:
+                    delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                    print(f"Attempt {attempt + 1}: HTTP Error {response.status_code}, retrying in {delay:.1f}s")
+                    self._sleep(delay)
+                    continue
+                if response.status_code >= 400:
+                    print(f"HTTP Error {response.status_code}: {response.reason}")
+                    return {"error": f"HTTP Error {response.status_code}: {response.reason}"}
+
+                data = response.text
+                if not data:
+                    print(f"Attempt {attempt + 1}: No data returned from API")
+                    if not last_attempt:
+                        self._sleep(self._backoff(attempt))
+                        continue
+                    return {"error": "No data returned from API"}
+
+                results = json.loads(data)
+                if not results:
+                    print(f"Attempt {attempt + 1}: Empty response from API")
+                    if not last_attempt:
+                        self._sleep(self._backoff(attempt))
+                        continue
+                    return {"error": "Empty response from API"}
+
+                if isinstance(results, dict) and "Error Message" in results:
+                    print(f"API Error: {results['Error Message']}")
+                    return {"error": results["Error Message"]}
+
+                return results
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not last_attempt:
+                    delay = self._backoff(attempt)
+                    print(f"Attempt {attempt + 1}: {e}, retrying in {delay:.1f}s")
+                    self._sleep(delay)
+                    continue
+                print(f"URL Error: {e}")
+                return {"error": f"URL Error: {e}"}
+            except requests.RequestException as e:
+                print(f"URL Error: {e}")
+                return {"error": f"URL Error: {e}"}
+            except json.JSONDecodeError:
+                print("Invalid JSON response from API")
+                return {"error": "Invalid JSON response from API"}
+            except Exception as e:
+                print(f"An unexpected error occurred: {str(e)}")
+                return {"error": f"An unexpected error occurred: {str(e)}"}
+
+        print(f"No valid data after {max_retries} attempts")
+        return {"error": f"No valid data after {max_retries} attempts"}
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Delay before the next attempt: Retry-After if given, else exponential with jitter."""
+        delay = _parse_retry_after(retry_after)
+        if delay is None:
+            ceiling = min(self.max_backoff, self.backoff_base * 2 ** attempt)
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+        return min(delay, self.max_backoff)
+
+    def _sleep(self, delay: float) -> None:
+        self.retries += 1
+        time.sleep(delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of the client's cache, coalescing, retry and rate limiter counters."""
+        return {
+            "cache": dict(self.cache.stats) if self.cache is not None else None,
+            "coalesced": self.inflight.coalesced,
+            "retries": self.retries,
+            "rate_limiter": dict(self.rate_limiter.stats) if self.rate_limiter is not None else None,
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[FMPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_fmp_client() -> FMPClient:
+    """Return the process-wide FMP client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = FMPClient.from_env()
+    return _client
@@ -1,13 +1,44 @@
+import argparse
+import functools
 import sys
 import warnings
 from typing import Any, Dict
 
 from swarm import Swarm
+from swarm.types import Response
+from cassette import cassette
 from agents import supervisor_agent
+from concurrency import get_tool_pool
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-client = Swarm()
+
+class ParallelSwarm(Swarm):
+    """Swarm that runs the tool calls of one model message concurrently.
+
+    Each call is dispatched by Swarm's own handler on the shared tool pool,
+    and the results are merged in call order, so the conversation is the
+    same as with serial dispatch.
+    """
+
+    def handle_tool_calls(self, tool_calls, functions, context_variables, debug) -> Response:
+        if len(tool_calls) < 2:
+            return super().handle_tool_calls(tool_calls, functions, context_variables, debug)
+        handle = super().handle_tool_calls
+        partials = get_tool_pool().map([
+            (call.function.name, functools.partial(handle, [call], functions, context_variables, debug))
+            for call in tool_calls
+        ])
+        response = Response(messages=[], agent=None, context_variables={})
+        for partial in partials:
+            response.messages.extend(partial.messages)
+            response.context_variables.update(partial.context_variables)
+            if partial.agent:
+                response.agent = partial.agent
+        return response
+
+
+client = ParallelSwarm()
 
 
 def run(query: str) -> str:
@@ -54,10 +85,21 @@ def interactive_mode():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        # If command line argument is provided, use it as the query
-        query = " ".join(sys.argv[1:])
-        print(run(query))
-    else:
-        # If no arguments, run in interactive mode
-        interactive_mode()
+    parser = argparse.ArgumentParser(description="Financial Assistant")
+    parser.add_argument("query", nargs="*", help="Question to answer; omit for interactive mode")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record all FMP, web and model calls to a cassette file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Replay FMP, web and model calls from a cassette file")
+    args = parser.parse_args()
+
+    if args.record and args.replay:
+        print("Error: Cannot specify both --record and --replay")
+        sys.exit(1)
+    cassette_mode = "record" if args.record else "replay" if args.replay else None
+
+    with cassette(cassette_mode, args.record or args.replay):
+        if args.query:
+            # If command line argument is provided, use it as the query
+            print(run(" ".join(args.query)))
+        else:
+            # If no arguments, run in interactive mode
+            interactive_mode()
@@ -1,88 +1,90 @@
-import json
-import time
-from urllib.request import urlopen, Request
-from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
-
-import certifi
-from dotenv import load_dotenv
-import os
-from typing import List, Literal, Dict, Any, Optional
-import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Dict, Any, Optional, Union
+
+from documents import get_document_library
+from fmp import get_fmp_client
+from formatting import OutputFormat, format_output
+from web import get_web_reader
 
 def _fmp_request(endpoint: str, params: Dict[str, Any] = None, max_retries: int = 3) -> Dict[str, Any]:
-    """Make a request to the FMP API with retry logic."""
-    load_dotenv()
-    try:
-        fmp_api_key = os.getenv('FMP_API_KEY')
-        base_url = "https://financialmodelingprep.com/api/v3"
-    except Exception as e:
-        print(f"No FMP_API_KEY found. You can get an API key at https://site.financialmodelingprep.com/: {e}")
-        return {"error": f"Error loading FMP API Key: {e}"}
-    
-    if params is None:
-        params = {}
-    params['apikey'] = fmp_api_key
-    url = f"{base_url}/{endpoint}?{urlencode(params)}"
-    
-    for attempt in range(max_retries):
-        try:
-            request = Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-            response = urlopen(request, cafile=certifi.where())
-            data = response.read().decode("utf-8")
-
-            if not data:
-                print(f"Attempt {attempt + 1}: No data returned from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "No data returned from API"}
-            
-            results = json.loads(data)
-            if not results:
-                print(f"Attempt {attempt + 1}: Empty response from API")
-                if attempt < max_retries - 1:
-                    time.sleep(1)
-                    continue
-                return {"error": "Empty response from API"}
-            
-            if isinstance(results, dict) and "Error Message" in results:
-                print(f"API Error: {results['Error Message']}")
-                return {"error": results["Error Message"]}
-            
-            return results
-        except HTTPError as e:
-            if e.code == 403:
-                print("HTTP Error 403: API access forbidden. Please check your API key.")
-                return {"error": "API access forbidden. Please check your API key."}
-            else:
-                print(f"HTTP Error {e.code}: {e.reason}")
-                return {"error": f"HTTP Error {e.code}: {e.reason}"}
-        except URLError as e:
-            print(f"URL Error: {e.reason}")
-            return {"error": f"URL Error: {e.reason}"}
-        except json.JSONDecodeError:
-            print("Invalid JSON response from API")
-            return {"error": "Invalid JSON response from API"}
-        except Exception as e:
-            print(f"An unexpected error occurred: {str(e)}")
-            return {"error": f"An unexpected error occurred: {str(e)}"}
-    
-    print(f"No valid data after {max_retries} attempts")
-    return {"error": f"No valid data after {max_retries} attempts"}
+    """Make a request to the FMP API through the shared pooled client."""
+    return get_fmp_client().request(endpoint, params, max_retries=max_retries)
+
+MAX_BATCH_SYMBOLS = 50
+MAX_BATCH_WORKERS = 5
+
+PROFILE_SUMMARY_FIELDS = [
+    "companyName", "price", "mktCap", "beta", "currency", "exchangeShortName",
+    "sector", "industry", "country", "ceo", "fullTimeEmployees", "ipoDate",
+]
+
+def _as_list(value: Union[List[str], str, None]) -> List[str]:
+    """List arguments may arrive as a comma- or space-separated string."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item for item in value.replace(",", " ").split() if item]
+    return list(value)
+
+def _normalize_symbols(symbols: Union[List[str], str]) -> List[str]:
+    """Upper-case and de-duplicate symbols, keeping their order."""
+    seen = []
+    for symbol in _as_list(symbols):
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen[:MAX_BATCH_SYMBOLS]
+
+def _fmp_batch_request(endpoint: str, symbols: List[str]) -> Dict[str, Any]:
+    """Fetch a comma-separated symbol list in one request, keyed by symbol."""
+    data = _fmp_request(f"{endpoint}/{','.join(symbols)}")
+    if "error" in data:
+        return {symbol: data for symbol in symbols}
+    return {item["symbol"]: item for item in data if "symbol" in item}
+
+def _fmp_map_symbols(fn, symbols: List[str]) -> Dict[str, Any]:
+    """Run a per-symbol function on a bounded thread pool, keyed by symbol."""
+    with ThreadPoolExecutor(max_workers=min(MAX_BATCH_WORKERS, len(symbols) or 1)) as executor:
+        return dict(zip(symbols, executor.map(fn, symbols)))
+
+PERIOD_ID_FIELDS = ["symbol", "date", "calendarYear", "period"]
+
+def _trim_periods(data: List[dict], fields: Union[List[str], str, None] = None, limit: Optional[int] = None) -> List[dict]:
+    """Keep only the most recent `limit` periods and the requested `fields` of each."""
+    if "error" in data:
+        return data
+    fields = _as_list(fields)
+    rows = data[:int(limit)] if limit else data
+    if not fields:
+        return rows
+    wanted = PERIOD_ID_FIELDS + [f for f in fields if f not in PERIOD_ID_FIELDS]
+    trimmed = []
+    for row in rows:
+        keys = {k.lower(): k for k in row}
+        trimmed.append({keys[f.lower()]: row[keys[f.lower()]] for f in wanted if f.lower() in keys})
+    return trimmed
 
 def generate_single_line_item_query(
     ticker: str,
     statement: Literal["income-statement", "balance-sheet-statement", "cash-flow-statement"] = "income-statement",
     period: Literal["annual", "quarter"] = "annual",
-) -> List[dict]:
-    """Generate a single line item query for a given ticker."""
+    fields: str = "",
+    limit: int = 0,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Generate a single line item query for a given ticker.
+
+    Pass `fields` (comma-separated, e.g. "netIncome,revenue") to return only those
+    line items and `limit` to return only the most recent periods (0 for all). Use output_format="table" for a
+    compact CSV table instead of a list of dicts.
+    """
     params = {"period": period}
+    if limit:
+        params["limit"] = int(limit)
     result = _fmp_request(f"{statement}/{ticker}", params)
     if "error" in result:
         return [result]
-    return result
+    return format_output(_trim_periods(result, fields, limit), output_format)
 
 def get_stock_price(symbol: str) -> dict:
     """Fetch the current stock price for a given symbol."""
@@ -98,21 +100,96 @@ def get_company_profile(symbol: str) -> dict:
         return data
     return data[0] if data else {"error": "No company profile data available"}
 
-def get_financial_ratios(symbol: str, period: Literal["annual", "quarter"] = "annual") -> List[dict]:
-    """Fetch financial ratios for a given symbol."""
+def get_financial_ratios(
+    symbol: str,
+    period: Literal["annual", "quarter"] = "annual",
+    fields: str = "",
+    limit: int = 0,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Fetch financial ratios for a given symbol.
+
+    Pass `fields` (comma-separated) to return only those financial ratios and `limit`
+    to return only the most recent periods (0 for all). Use output_format="table" for a compact CSV table
+    instead of a list of dicts.
+    """
     params = {"period": period}
-    return _fmp_request(f"ratios/{symbol}", params)
+    if limit:
+        params["limit"] = int(limit)
+    return format_output(_trim_periods(_fmp_request(f"ratios/{symbol}", params), fields, limit), output_format)
 
-def get_key_metrics(symbol: str, period: Literal["annual", "quarter"] = "annual") -> List[dict]:
-    """Fetch key metrics for a given symbol."""
+def get_key_metrics(
+    symbol: str,
+    period: Literal["annual", "quarter"] = "annual",
+    fields: str = "",
+    limit: int = 0,
+    output_format: OutputFormat = "json",
+) -> Union[List[dict], str]:
+    """Fetch key metrics for a given symbol.
+
+    Pass `fields` (comma-separated) to return only those key metrics and `limit`
+    to return only the most recent periods (0 for all). Use output_format="table" for a compact CSV table
+    instead of a list of dicts.
+    """
     params = {"period": period}
-    return _fmp_request(f"key-metrics/{symbol}", params)
+    if limit:
+        params["limit"] = int(limit)
+    return format_output(_trim_periods(_fmp_request(f"key-metrics/{symbol}", params), fields, limit), output_format)
 
 def get_market_cap(symbol: str) -> dict:
     """Fetch the current market cap for a given symbol."""
     data = _fmp_request(f"market-capitalization/{symbol}")
     return data[0] if data else {"error": "No market cap data available"}
 
+def get_stock_prices(symbols: str, output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch the current stock prices for several symbols in a single call.
+
+    Pass the symbols comma-separated, e.g. "TSLA,F,GM".
+    """
+    symbols = _normalize_symbols(symbols)
+    quotes = _fmp_batch_request("quote-short", symbols)
+    prices = {}
+    for symbol in symbols:
+        quote = quotes.get(symbol)
+        if quote is None:
+            prices[symbol] = {"error": "No price data available"}
+        elif "error" in quote:
+            prices[symbol] = quote
+        else:
+            prices[symbol] = {"price": quote["price"]}
+    return format_output(prices, output_format)
+
+def get_company_profiles(symbols: str, output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch a compact company profile for several symbols in a single call.
+
+    Pass the symbols comma-separated, e.g. "TSLA,F,GM".
+    """
+    symbols = _normalize_symbols(symbols)
+    profiles = _fmp_batch_request("profile", symbols)
+    summaries = {}
+    for symbol in symbols:
+        profile = profiles.get(symbol)
+        if profile is None:
+            summaries[symbol] = {"error": "No company profile data available"}
+        elif "error" in profile:
+            summaries[symbol] = profile
+        else:
+            summaries[symbol] = {k: profile.get(k) for k in PROFILE_SUMMARY_FIELDS}
+    return format_output(summaries, output_format)
+
+def get_market_caps(symbols: str, output_format: OutputFormat = "json") -> Union[Dict[str, dict], str]:
+    """Fetch the current market cap for several symbols in a single call.
+
+    Pass the symbols comma-separated, e.g. "TSLA,F,GM".
+    """
+    def market_cap(symbol: str) -> dict:
+        data = _fmp_request(f"market-capitalization/{symbol}")
+        if "error" in data:
+            return data
+        return {"marketCap": data[0]["marketCap"], "date": data[0]["date"]} if data else {"error": "No market cap data available"}
+
+    return format_output(_fmp_map_symbols(market_cap, _normalize_symbols(symbols)), output_format)
+
 def get_stock_screener(
     market_cap_more_than: Optional[int] = None,
     market_cap_lower_than: Optional[int] = None,
@@ -131,14 +208,15 @@ def get_stock_screener(
     industry: Optional[str] = None,
     country: Optional[str] = None,
     exchange: Optional[str] = None,
-    limit: int = 10
-) -> List[Dict[str, Any]]:
+    limit: int = 10,
+    output_format: OutputFormat = "json",
+) -> Union[List[Dict[str, Any]], str]:
     """Fetch stocks based on screening criteria."""
     # Convert camelCase to snake_case using a dictionary comprehension
     params = {
         k: str(v).lower() if isinstance(v, bool) else v
         for k, v in locals().items()
-        if v is not None and k != 'limit'
+        if v is not None and k not in ('limit', 'output_format')
     }
     
     # Convert snake_case to camelCase for API parameters
@@ -148,32 +226,46 @@ def get_stock_screener(
     }
     api_params['limit'] = limit
 
-    return _fmp_request("stock-screener", api_params)
+    return format_output(_fmp_request("stock-screener", api_params), output_format)
+
+def read_webpage(url: str, main_content: bool = False, query: Optional[str] = None) -> str:
+    """Read text content from a given webpage URL.
 
-def read_webpage(url: str) -> str:
-    """Read text content from a given webpage URL."""
-    try:
-        print(f"Agent visiting webpage: {url}")
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+    With main_content=True only the article body is returned, without
+    navigation, cookie banners, footers or related-article lists. Prefer it
+    for news articles, press releases and blog posts; use the default full
+    text for pages whose data sits in tables or lists.
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+    Pass the question being researched as query to get back only the most
+    relevant passages of the page (a few thousand tokens) instead of its
+    first 50,000 characters; this also finds figures deep inside long pages
+    such as filings or transcripts.
+    """
+    return get_web_reader().read(url, main_content=main_content, query=query)
 
-        for script in soup(["script", "style"]):
-            script.decompose()
+def read_webpages(
+    urls: str, timeout: float = 10, main_content: bool = False, query: Optional[str] = None
+) -> Dict[str, str]:
+    """Read text content from several webpage URLs concurrently.
 
-        text = soup.get_text(separator='\n', strip=True)
+    Pass the URLs separated by commas or spaces.
 
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+    Returns the text of each page keyed by URL; pages that fail to load map to
+    an error message, so partial results are still returned. main_content
+    and query work as in read_webpage.
+    """
+    return get_web_reader().read_many(_as_list(urls), timeout=timeout, main_content=main_content, query=query)
 
-        return text[:50000]
+def read_document(path: str, section: Optional[str] = None, query: Optional[str] = None) -> str:
+    """Read a local filing or report (e.g. a 10-K or 10-Q) from the documents directory.
 
-    except requests.RequestException as e:
-        return f"Error fetching the webpage: {str(e)}"
-    except Exception as e:
-        return f"Error processing the webpage: {str(e)}"
+    Without a section, returns the document's sections (e.g. "Item 7:
+    Management's Discussion and Analysis") with their sizes. With a section
+    ("Item 7", "7A", "Part II Item 1A", "Risk Factors" or "MD&A"), returns
+    that section's text. Add a query to get only the passages of the section
+    most relevant to the question, which is best for large sections such as
+    the financial statements; a query without a section searches the whole
+    document, e.g. a call transcript without Item headings. An unknown path
+    lists the available documents.
+    """
+    return get_document_library().read(path, section=section, query=query)
@@ -0,0 +1,148 @@
+"""Micro-benchmark for the HTML-to-text backends behind read_webpage.
+
+Runs every backend in `web.EXTRACTORS` over a saved corpus of pages, feeding
+each page in download-sized chunks as `WebReader.read` does, and reports
+throughput, memory and whether the output matches the BeautifulSoup
+reference. Each backend runs in its own process so memory numbers do not
+leak between them.
+
+    python dev/extract_bench/bench.py save https://example.com/news ...
+    python dev/extract_bench/bench.py run --repeat 5
+"""
+
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "apps", "langgraph-fin-agent"))
+
+from langgraph_fin_agent import web  # noqa: E402
+
+DEFAULT_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, str]]:
+    paths = sorted(glob.glob(os.path.join(corpus_dir, "*.htm*")))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((os.path.basename(path), f.read()))
+    return pages
+
+
+def extract(backend: str, html: str) -> str:
+    extractor = web.EXTRACTORS[backend]()
+    for start in range(0, len(html), web.CHUNK_SIZE):
+        extractor.feed(html[start : start + web.CHUNK_SIZE])
+    extractor.close()
+    return extractor.text()
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def bench_backend(backend: str, corpus_dir: str, repeat: int) -> Dict[str, float]:
+    pages = load_corpus(corpus_dir)
+    extract(backend, pages[0][1])  # warm up imports
+    baseline_rss = _peak_rss_bytes()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _, html in pages:
+            extract(backend, html)
+        timings.append(time.perf_counter() - started)
+    rss_growth = _peak_rss_bytes() - baseline_rss
+
+    reference = {name: web.extract_text(html) for name, html in pages}
+    mismatches, heap_peak = 0, 0
+    for name, html in pages:
+        tracemalloc.start()
+        text = extract(backend, html)
+        heap_peak = max(heap_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        mismatches += text != reference[name]
+
+    seconds = statistics.median(timings)
+    total_bytes = sum(len(html.encode("utf-8")) for _, html in pages)
+    return {
+        "pages_per_s": len(pages) / seconds,
+        "mb_per_s": total_bytes / seconds / 1e6,
+        "ms_per_page": seconds / len(pages) * 1000,
+        "heap_peak_mb": heap_peak / 1e6,
+        "rss_growth_mb": rss_growth / 1e6,
+        "mismatches": mismatches,
+    }
+
+
+def _run_isolated(backend: str, corpus_dir: str, repeat: int) -> Dict[str, float]:
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(bench_backend, (backend, corpus_dir, repeat))
+
+
+def run(corpus_dir: str, backends: List[str], repeat: int) -> None:
+    pages = load_corpus(corpus_dir)
+    if not pages:
+        sys.exit(f"No .html files in {corpus_dir}; add some with the `save` command")
+    size = sum(len(html.encode("utf-8")) for _, html in pages)
+    print(f"{len(pages)} pages, {size / 1e6:.1f} MB, median of {repeat} runs\n")
+
+    columns = ("pages_per_s", "mb_per_s", "ms_per_page", "heap_peak_mb", "rss_growth_mb", "mismatches")
+    print(f"{'backend':<12}" + "".join(f"{column:>15}" for column in columns))
+    for backend in backends:
+        try:
+            result = _run_isolated(backend, corpus_dir, repeat)
+        except ImportError as e:
+            print(f"{backend:<12}  skipped: {e}")
+            continue
+        print(f"{backend:<12}" + "".join(f"{result[column]:>15.2f}" for column in columns[:-1]) + f"{result['mismatches']:>15}")
+
+
+def save(urls: List[str], corpus_dir: str) -> None:
+    """Download pages into the corpus, named by a hash of their URL."""
+    os.makedirs(corpus_dir, exist_ok=True)
+    reader = web.WebReader()
+    for url in urls:
+        response = reader.session_for(url).get(url, timeout=reader.timeout)
+        if not response.ok:
+            print(f"Skipped {url}: HTTP {response.status_code}")
+            continue
+        path = os.path.join(corpus_dir, hashlib.sha1(url.encode()).hexdigest()[:16] + ".html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(response.text)
+        print(f"Saved {url} -> {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the read_webpage text extraction backends")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Benchmark backends over the corpus")
+    run_parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="Directory of saved .html pages")
+    run_parser.add_argument("--backend", "-b", action="append", choices=tuple(web.EXTRACTORS), help="Backends to run (default: all)")
+    run_parser.add_argument("--repeat", "-r", type=int, default=3, help="Timed passes over the corpus")
+
+    save_parser = subparsers.add_parser("save", help="Download pages into the corpus")
+    save_parser.add_argument("urls", nargs="+")
+    save_parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="Directory of saved .html pages")
+
+    args = parser.parse_args()
+    if args.command == "save":
+        save(args.urls, args.corpus)
+    else:
+        run(args.corpus, args.backend or list(web.EXTRACTORS), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Load test for the HTTP serving mode of the LangGraph finance agent.
+
+`serve` runs `finchat --serve` with stub models in place of the OpenAI
+calls: the agents and the summarizer answer after a fixed latency, and the
+supervisor's deterministic routing decides the order, so the server can be
+exercised locally without keys or cost. `run` sends concurrent
+conversations to a server and reports latencies and the server's counters.
+
+    python dev/load_test/load.py serve --port 8000 --model-latency-ms 500
+    python dev/load_test/load.py run --url http://127.0.0.1:8000 --users 50 --turns 3
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "apps", "langgraph-fin-agent"))
+
+# The graph module creates its OpenAI client on import; stub runs never use it.
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+from langchain_core.messages import AIMessage  # noqa: E402
+
+from langgraph_fin_agent import graph  # noqa: E402
+from langgraph_fin_agent.server import serve  # noqa: E402
+
+QUESTIONS = [
+    "What is the current stock price of TSLA?",
+    "Compare the operating margins of F and GM",
+    "Summarize https://ir.tesla.com/press-release/q4-results",
+    "How did TSLA revenue growth compare with https://example.com/ev-market-report?",
+]
+
+
+class StubAgent:
+    """Replies to the latest question after a fixed delay, like a ReAct agent run."""
+
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+
+    async def ainvoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        question = state["messages"][-1].content
+        return {"messages": list(state["messages"]) + [AIMessage(content=f"{self.name} data for: {question}")]}
+
+
+class StubModel:
+    """Stands in for the summarizing LLM and the supervisor chain."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def ainvoke(self, inputs: Any) -> Any:
+        await asyncio.sleep(self.latency)
+        if isinstance(inputs, dict):
+            raw = AIMessage(content="FINISH")
+            return {"raw": raw, "parsed": graph.RouteResponse(next="FINISH"), "parsing_error": None}
+        return AIMessage(content=f"Summary of {len(inputs[-1][1].splitlines())} lines of findings.")
+
+
+def stub_models(latency: float) -> None:
+    model = StubModel(latency)
+    graph.LLM = model
+    graph.SUPERVISOR_CHAIN = model
+    for name in graph.WORKERS:
+        node = functools.partial(graph.agent_node, agent=StubAgent(name, latency), name=name)
+        setattr(graph, "financial_data_node" if name == "Financial_Data_Agent" else "web_research_node", node)
+
+
+def stats() -> Dict[str, Any]:
+    return {"routing": dict(graph.PRE_ROUTER.stats), "prompt_tokens": graph.PROMPT_TOKENS.summary()}
+
+
+async def conversation(client: httpx.AsyncClient, url: str, user: int, turns: int, results: Dict[str, List]) -> None:
+    thread_id = None
+    for turn in range(turns):
+        payload = {"message": QUESTIONS[(user + turn) % len(QUESTIONS)], "thread_id": thread_id}
+        started = time.perf_counter()
+        first_event = None
+        event = None
+        async with client.stream("POST", f"{url}/chat", json=payload) as response:
+            if response.status_code != 200:
+                results["rejected"].append(response.status_code)
+                return
+            thread_id = response.headers["X-Thread-Id"]
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if first_event is None and event != "queued":
+                        first_event = time.perf_counter() - started
+                elif line.startswith("data: ") and event in ("done", "error"):
+                    results[event].append(json.loads(line[len("data: "):]))
+        results["first_event"].append(first_event or 0.0)
+        results["latency"].append(time.perf_counter() - started)
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run(url: str, users: int, turns: int) -> None:
+    results: Dict[str, List] = {"latency": [], "first_event": [], "done": [], "error": [], "rejected": []}
+    limits = httpx.Limits(max_connections=users)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(conversation(client, url, user, turns, results) for user in range(users)))
+        elapsed = time.perf_counter() - started
+        server_stats = (await client.get(f"{url}/stats")).json()
+
+    latency = results["latency"]
+    print(f"{users} users x {turns} turns in {elapsed:.2f}s ({len(latency) / elapsed:.1f} answers/s)")
+    print(f"completed {len(results['done'])}, errors {len(results['error'])}, rejected {len(results['rejected'])}")
+    if latency:
+        print(
+            f"latency p50 {statistics.median(latency):.2f}s p95 {percentile(latency, 0.95):.2f}s"
+            f" max {max(latency):.2f}s, first event p50 {statistics.median(results['first_event']):.2f}s"
+        )
+    print(json.dumps(server_stats, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for finchat --serve")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve the graph with stub models")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--model-latency-ms", type=float, default=500.0, help="Latency of each stub model call")
+
+    run_parser = subparsers.add_parser("run", help="Send concurrent conversations to a server")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8000")
+    run_parser.add_argument("--users", type=int, default=20, help="Concurrent conversations")
+    run_parser.add_argument("--turns", type=int, default=2, help="Questions per conversation")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        asyncio.run(run(args.url.rstrip("/"), args.users, args.turns))
+        return
+
+    stub_models(args.model_latency_ms / 1000)
+    try:
+        asyncio.run(serve(graph.build_app(), args.host, args.port, stats=stats))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Offline stand-in for the FMP API.
+
+Serves recorded JSON fixtures for the endpoints used by the finance agents,
+with optional latency, error and rate-limit injection, so that the apps can
+be benchmarked and load-tested without quota or changing data. Point an app
+at it with:
+
+    FMP_BASE_URL=http://127.0.0.1:8765/api/v3
+
+Run `python server.py serve --help` and `python server.py record --help` for
+the available options.
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+
+API_PREFIX = "/api/v3/"
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FMP_BASE_URL = "https://financialmodelingprep.com/api/v3"
+
+SYMBOL_ENDPOINTS = (
+    "quote-short",
+    "quote",
+    "profile",
+    "market-capitalization",
+)
+PERIOD_ENDPOINTS = (
+    "income-statement",
+    "balance-sheet-statement",
+    "cash-flow-statement",
+    "ratios",
+    "key-metrics",
+)
+
+
+class Fixtures:
+    """Recorded responses laid out as `<endpoint>/<SYMBOL>[.quarter].json`."""
+
+    def __init__(self, root: str = DEFAULT_FIXTURES_DIR):
+        self.root = root
+        self._cache: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, relative_path: str) -> Any:
+        with self._lock:
+            if relative_path not in self._cache:
+                path = os.path.join(self.root, relative_path)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        self._cache[relative_path] = json.load(f)
+                else:
+                    self._cache[relative_path] = None
+            return self._cache[relative_path]
+
+    def lookup(self, endpoint: str, symbols: str, params: Dict[str, str]) -> Optional[List[dict]]:
+        """Return the fixture for a request, or None if the endpoint is unknown.
+
+        Like FMP, unknown symbols yield an empty list.
+        """
+        limit = int(params["limit"]) if params.get("limit", "").isdigit() else None
+
+        if endpoint == "stock-screener":
+            rows = self._load("stock-screener.json") or []
+            return rows[:limit] if limit else rows
+
+        if endpoint in SYMBOL_ENDPOINTS:
+            rows = []
+            for symbol in symbols.split(","):
+                rows.extend(self._load(os.path.join(endpoint, f"{symbol.strip().upper()}.json")) or [])
+            return rows
+
+        if endpoint in PERIOD_ENDPOINTS:
+            suffix = ".quarter.json" if params.get("period") == "quarter" else ".json"
+            rows = self._load(os.path.join(endpoint, f"{symbols.strip().upper()}{suffix}")) or []
+            return rows[:limit] if limit else rows
+
+        return None
+
+
+class FaultConfig:
+    """Latency and failure injection settings."""
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        max_rps: float = 0.0,
+        retry_after: float = 1.0,
+        api_key: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_rps = max_rps
+        self.retry_after = retry_after
+        self.api_key = api_key
+        self.random = random.Random(seed)
+
+
+class MockFMPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], fixtures: Fixtures, faults: FaultConfig, verbose: bool = False):
+        super().__init__(address, MockFMPHandler)
+        self.fixtures = fixtures
+        self.faults = faults
+        self.verbose = verbose
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "not_found": 0}
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def over_rate_limit(self) -> bool:
+        """Fixed one-second window limiter used for `max_rps`."""
+        if self.faults.max_rps <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            return self._window_count > self.faults.max_rps
+
+
+class MockFMPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+    server: MockFMPServer
+
+    def do_GET(self):
+        server = self.server
+        faults = server.faults
+        server.count("requests")
+
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        delay_ms = faults.latency_ms + faults.random.uniform(-faults.jitter_ms, faults.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+        if faults.api_key and params.get("apikey") != faults.api_key:
+            return self._send(403, {"Error Message": "Invalid API KEY."})
+        if server.over_rate_limit() or faults.random.random() < faults.rate_limit_rate:
+            server.count("rate_limited")
+            return self._send(429, {"Error Message": "Limit Reach."}, {"Retry-After": f"{faults.retry_after:g}"})
+        if faults.random.random() < faults.error_rate:
+            server.count("errors")
+            return self._send(500, {"Error Message": "Injected server error."})
+
+        if not url.path.startswith(API_PREFIX):
+            server.count("not_found")
+            return self._send(404, {"Error Message": f"Unknown path {url.path}"})
+        endpoint, _, symbols = url.path[len(API_PREFIX):].partition("/")
+        data = server.fixtures.lookup(endpoint, symbols, params)
+        if data is None:
+            server.count("not_found")
+            return self._send(404, {"Error Message": f"Unknown endpoint {endpoint}"})
+        return self._send(200, data)
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def start_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    fixtures_dir: str = DEFAULT_FIXTURES_DIR,
+    faults: Optional[FaultConfig] = None,
+    verbose: bool = False,
+) -> MockFMPServer:
+    """Start the server on a background thread; `port=0` picks a free port.
+
+    Use `server.base_url` as FMP_BASE_URL and `server.shutdown()` to stop it.
+    """
+    server = MockFMPServer((host, port), Fixtures(fixtures_dir), faults or FaultConfig(), verbose)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def record(symbols: List[str], out_dir: str, api_key: str, base_url: str = FMP_BASE_URL, screener_limit: int = 100) -> None:
+    """Record live FMP responses for the given symbols as fixtures."""
+
+    def fetch(endpoint: str, params: Dict[str, Any]) -> Any:
+        query = urlencode({**params, "apikey": api_key})
+        request = Request(f"{base_url}/{endpoint}?{query}", headers={"User-Agent": "Mozilla/5.0"})
+        with urlopen(request) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def write(relative_path: str, data: Any) -> None:
+        path = os.path.join(out_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+        print(f"Recorded {relative_path}")
+
+    for symbol in (s.upper() for s in symbols):
+        for endpoint in SYMBOL_ENDPOINTS:
+            write(os.path.join(endpoint, f"{symbol}.json"), fetch(f"{endpoint}/{symbol}", {}))
+        for endpoint in PERIOD_ENDPOINTS:
+            write(os.path.join(endpoint, f"{symbol}.json"), fetch(f"{endpoint}/{symbol}", {"period": "annual"}))
+            write(os.path.join(endpoint, f"{symbol}.quarter.json"), fetch(f"{endpoint}/{symbol}", {"period": "quarter"}))
+    write("stock-screener.json", fetch("stock-screener", {"limit": screener_limit}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline stand-in for the FMP API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Serve recorded fixtures")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Fixtures directory")
+    serve_parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean added latency per request")
+    serve_parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform jitter around the latency")
+    serve_parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    serve_parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    serve_parser.add_argument("--max-rps", type=float, default=0.0, help="Answer 429 above this many requests per second")
+    serve_parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    serve_parser.add_argument("--api-key", help="Reject requests without this apikey (403)")
+    serve_parser.add_argument("--seed", type=int, help="Seed for reproducible fault injection")
+    serve_parser.add_argument("--verbose", "-v", action="store_true", help="Log every request")
+
+    record_parser = subparsers.add_parser("record", help="Record fixtures from the live FMP API (needs FMP_API_KEY)")
+    record_parser.add_argument("symbols", nargs="+")
+    record_parser.add_argument("--out", default=DEFAULT_FIXTURES_DIR, help="Fixtures directory")
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        api_key = os.getenv("FMP_API_KEY")
+        if not api_key:
+            parser.error("FMP_API_KEY must be set to record fixtures")
+        record(args.symbols, args.out, api_key)
+        return
+
+    faults = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_rps=args.max_rps,
+        retry_after=args.retry_after,
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+    server = MockFMPServer((args.host, args.port), Fixtures(args.fixtures), faults, args.verbose)
+    print(f"Mock FMP API serving {args.fixtures} at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()